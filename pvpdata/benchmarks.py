@@ -0,0 +1,260 @@
+"""
+Benchmarks for the data tooling.
+
+Import benchmarks run commands with ``python -X importtime`` and compare the
+modules they load against a baseline command, so only the cost added by this
+project's code is counted.
+
+Memory and encoding benchmarks scale the site's data up by repeating its
+usages, as a history of many guide dates would.
+"""
+
+from collections.abc import Mapping
+import dataclasses
+from dataclasses import dataclass
+from enum import Enum
+import gzip
+import json
+import subprocess
+import sys
+import time
+import tracemalloc
+
+from . import PROJECT_ROOT
+from .sitefiles import encode_pvp_json
+from .sitefiles import load_site_data
+from .sitefiles import ship_from_json
+from .sitefiles import ship_usage_from_json
+from .sitefiles import to_json_serializable
+from .types import EquipWithRank
+from .types import ShipUsage
+
+# Dependencies that must only be imported by the code that uses them
+HEAVY_MODULES = frozenset({'bs4', 'git', 'lxml', 'markdown', 'mediawiki', 'more_itertools', 'numpy'})
+
+# Runs per command. The fastest run is used to reduce noise.
+IMPORT_RUNS = 10
+
+
+@dataclass(frozen=True)
+class StartupBudget:
+    name: str
+    args: list[str]
+    # Command whose imports are not counted against the budget
+    baseline_args: list[str]
+    budget_ms: float
+
+
+INVOKE_BASELINE = ['-m', 'invoke', '--version']
+
+# Import times vary by about a third between runs on the same machine, so
+# budgets leave that much room over typical times. Heavy dependencies are
+# caught by HEAVY_MODULES regardless of timing.
+STARTUP_BUDGETS = [
+    StartupBudget('task listing', ['-m', 'invoke', '--list'], INVOKE_BASELINE, 25),
+    StartupBudget('cleangamefiles', ['-m', 'invoke', '--dry', 'cleangamefiles'], INVOKE_BASELINE, 25),
+    StartupBudget('extract --help', ['-m', 'pvpdata.extract', '--help'], ['-c', 'import argparse'], 50),
+]
+
+
+@dataclass(frozen=True)
+class ImportTimes:
+    # Cumulative microseconds of each import not made from inside another import
+    top_level_us: dict[str, int]
+    modules: frozenset[str]
+
+
+def measure_imports(args: list[str]) -> ImportTimes:
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', *args],
+        cwd=PROJECT_ROOT,
+        capture_output=True,
+        check=True,
+        encoding='utf-8',
+    )
+
+    top_level_us = {}
+    modules = set()
+    for line in result.stderr.splitlines():
+        # Format: "import time: <self us> | <cumulative us> | <indented module name>"
+        if not line.startswith('import time:'):
+            continue
+
+        _, cumulative, name_column = line.split('|')
+        if not cumulative.strip().isdigit():
+            # Header line
+            continue
+
+        name = name_column.strip()
+        modules.add(name)
+        # Nested imports are indented by two spaces per level after the one separating space
+        if not name_column[1:].startswith(' '):
+            top_level_us[name] = int(cumulative)
+
+    return ImportTimes(top_level_us, frozenset(modules))
+
+
+def added_import_ms(times: ImportTimes, baseline: ImportTimes) -> float:
+    return sum(
+        us for name, us in times.top_level_us.items()
+        if name not in baseline.modules
+    ) / 1000
+
+
+def check_startup_budgets(budgets: list[StartupBudget] = STARTUP_BUDGETS) -> list[str]:
+    """
+    Returns a description of each exceeded budget.
+    """
+    problems = []
+
+    for budget in budgets:
+        baseline = measure_imports(budget.baseline_args)
+        runs = [measure_imports(budget.args) for _ in range(IMPORT_RUNS)]
+
+        added_ms = min(added_import_ms(r, baseline) for r in runs)
+        heavy = sorted(HEAVY_MODULES & runs[0].modules)
+
+        status = 'OK' if added_ms <= budget.budget_ms and not heavy else 'OVER'
+        print(f'{budget.name}: {added_ms:.1f} ms of imports (budget {budget.budget_ms} ms) {status}')
+
+        if added_ms > budget.budget_ms:
+            problems.append(f'{budget.name} takes {added_ms:.1f} ms to import, over the {budget.budget_ms} ms budget')
+        if heavy:
+            problems.append(f'{budget.name} imports heavy dependencies: {", ".join(heavy)}')
+
+    return problems
+
+
+def _traced_bytes(build) -> int:
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        # Assigned so the result stays alive until memory is measured
+        result = build()
+        return tracemalloc.get_traced_memory()[0] - before
+    finally:
+        tracemalloc.stop()
+
+
+def measure_usage_memory(count: int = 10_000):
+    """
+    Prints the memory per usage, including its ship, for count usages.
+
+    Each usage and ship is decoded from JSON text separately, like records
+    loaded from many data files, so nothing is shared unless the data model
+    shares it. Equipment records are loaded once and shared, as they are
+    within one run.
+    """
+    site_data = load_site_data()
+    templates = [
+        (
+            json.dumps(u.ship, default=to_json_serializable),
+            json.dumps(u, default=to_json_serializable),
+        )
+        for u in site_data.usages
+    ]
+
+    def build_usages():
+        usages = []
+        for i in range(count):
+            ship_text, usage_text = templates[i % len(templates)]
+            ship = ship_from_json(json.loads(ship_text))
+            usages.append(ship_usage_from_json(json.loads(usage_text), {ship.name: ship}, site_data.equipment))
+        return usages
+
+    def build_json():
+        return [
+            (json.loads(ship_text), json.loads(usage_text))
+            for ship_text, usage_text in (templates[i % len(templates)] for i in range(count))
+        ]
+
+    usage_bytes = _traced_bytes(build_usages)
+    json_bytes = _traced_bytes(build_json)
+
+    print(f'{count} usages of {len(templates)} distinct ships')
+    print(f'Data types:  {usage_bytes / count:8.0f} bytes per ship ({usage_bytes / 2**20:.1f} MiB)')
+    print(f'Parsed JSON: {json_bytes / count:8.0f} bytes per ship ({json_bytes / 2**20:.1f} MiB)')
+
+
+def _best_seconds(func, runs: int) -> float:
+    best = float('inf')
+    for _ in range(runs):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def _asdict_serializable(o):
+    # The conversion used before per-type converters, for comparison: an
+    # isinstance check per type, and dataclasses.asdict deep copying records
+    if isinstance(o, EquipWithRank):
+        return {'name': o.equip.name, 'rank': o.rank.name}
+
+    if isinstance(o, ShipUsage):
+        return {
+            'ship': o.ship.name,
+            'description': o.description,
+            'description_html': o.description_html,
+            'equipment': o.slots,
+        }
+
+    if dataclasses.is_dataclass(o):
+        return dataclasses.asdict(o)
+
+    if isinstance(o, Enum):
+        return o.name
+
+    if isinstance(o, Mapping):
+        return dict(o)
+
+    raise TypeError(f'Cannot serialize {o} {type(o).__name__})')
+
+
+def measure_encoding(count: int = 10_000, runs: int = 3):
+    """
+    Prints the time to write count usages and their ships in each data file
+    format, compared with converting records with dataclasses.asdict, and the
+    size of each format.
+    """
+    import brotli
+
+    site_data = load_site_data()
+    usages = [site_data.usages[i % len(site_data.usages)] for i in range(count)]
+    data = {'ships': [u.ship for u in usages], 'usages': usages}
+
+    print(f'{count} usages of {len(site_data.usages)} distinct ships, best of {runs} runs')
+
+    for minify, label in ((False, 'indented'), (True, 'minified')):
+        format_args = {'separators': (',', ':')} if minify else {'indent': 4}
+        encoded = encode_pvp_json(data, minify)
+        if json.dumps(data, default=_asdict_serializable, **format_args) != encoded:
+            raise AssertionError(f'{label} output differs from dataclasses.asdict output')
+
+        converter_s = _best_seconds(lambda: encode_pvp_json(data, minify), runs)
+        asdict_s = _best_seconds(lambda: json.dumps(data, default=_asdict_serializable, **format_args), runs)
+        print(
+            f'{label:>9}: {converter_s * 1000:8.1f} ms with converters, '
+            f'{asdict_s * 1000:8.1f} ms with dataclasses.asdict ({asdict_s / converter_s:.2f}x)'
+        )
+
+    minified = encode_pvp_json(data, minify=True).encode('utf-8')
+    sizes = {
+        'indented': len(encode_pvp_json(data).encode('utf-8')),
+        'minified': len(minified),
+        'gzip': len(gzip.compress(minified, compresslevel=9, mtime=0)),
+        'brotli': len(brotli.compress(minified, quality=11)),
+    }
+    for label, size in sizes.items():
+        print(f'{label:>9}: {size / 2**10:9.1f} KiB')
+
+
+def main():
+    if problems := check_startup_budgets():
+        for p in problems:
+            print(p)
+        sys.exit(1)
+
+
+if '__main__' == __name__:
+    main()
@@ -0,0 +1,212 @@
+"""
+Semantic diff between two versions of the site's data files.
+
+Records are keyed by ship or equipment name, so comparing two versions is
+linear in the size of the data. The result can be rendered as a changelog
+entry in the style of the changelog page or written as JSON.
+"""
+
+from collections.abc import Callable
+from collections.abc import Mapping
+import dataclasses
+from dataclasses import dataclass
+from dataclasses import field
+from datetime import date
+import json
+from pathlib import Path
+import re
+import subprocess
+from typing import Any
+
+from . import DATA_DIR
+from . import PROJECT_ROOT
+from . import SITE_SOURCE
+from .sitefiles import get_data_path
+from .sitefiles import read_pvp_json_data
+from .types import EquipmentRank
+from .types import Equipment
+from .types import Ship
+from .types import ShipUsage
+
+CHANGELOG_PATH = SITE_SOURCE / '_pages' / 'changelog.md'
+
+
+@dataclass(frozen=True)
+class RawSiteData:
+    """Data files as parsed JSON, without resolving references between them."""
+    ships: dict[str, dict[str, Any]]
+    equipment: dict[str, dict[str, Any]]
+    usages: list[dict[str, Any]]
+
+
+def read_raw_site_data(data_dir: Path = DATA_DIR) -> RawSiteData:
+    return RawSiteData(
+        read_pvp_json_data(get_data_path(Ship, data_dir)),
+        read_pvp_json_data(get_data_path(Equipment, data_dir)),
+        read_pvp_json_data(get_data_path(ShipUsage, data_dir)),
+    )
+
+
+def read_raw_site_data_at_revision(revision: str) -> RawSiteData:
+    def git_show(datatype: type):
+        repo_path = get_data_path(datatype).relative_to(PROJECT_ROOT).as_posix()
+        result = subprocess.run(
+            ['git', 'show', f'{revision}:{repo_path}'],
+            cwd=PROJECT_ROOT,
+            capture_output=True,
+            check=True,
+            encoding='utf-8',
+        )
+        return json.loads(result.stdout)
+
+    return RawSiteData(git_show(Ship), git_show(Equipment), git_show(ShipUsage))
+
+
+@dataclass(frozen=True)
+class RankChange:
+    ship: str
+    slot: str
+    equipment: str
+    # None means the equipment was not listed in that slot
+    old_rank: str | None
+    new_rank: str | None
+
+
+@dataclass(frozen=True)
+class FieldChange:
+    name: str
+    field: str
+    old: Any
+    new: Any
+
+
+@dataclass
+class DataDelta:
+    ships_added: list[str] = field(default_factory=list)
+    ships_removed: list[str] = field(default_factory=list)
+    rank_changes: list[RankChange] = field(default_factory=list)
+    descriptions_changed: list[str] = field(default_factory=list)
+    equipment_added: list[str] = field(default_factory=list)
+    equipment_removed: list[str] = field(default_factory=list)
+    ship_changes: list[FieldChange] = field(default_factory=list)
+    equipment_changes: list[FieldChange] = field(default_factory=list)
+
+    def __bool__(self):
+        return any(getattr(self, f.name) for f in dataclasses.fields(self))
+
+    def to_json_data(self) -> dict[str, Any]:
+        return dataclasses.asdict(self)
+
+
+def _diff_keys(old: Mapping[str, Any], new: Mapping[str, Any]) -> tuple[list[str], list[str], list[str]]:
+    """Returns added, removed and common keys, in the order of new then old."""
+    added = [k for k in new if k not in old]
+    removed = [k for k in old if k not in new]
+    common = [k for k in new if k in old]
+    return added, removed, common
+
+
+def _diff_records(old: Mapping[str, Any], new: Mapping[str, Any]) -> list[FieldChange]:
+    changes = []
+    for name in _diff_keys(old, new)[2]:
+        old_record, new_record = old[name], new[name]
+        for key in dict.fromkeys([*new_record, *old_record]):
+            if key != 'name' and old_record.get(key) != new_record.get(key):
+                changes.append(FieldChange(name, key, old_record.get(key), new_record.get(key)))
+    return changes
+
+
+def _diff_slots(ship: str, old: Mapping[str, list], new: Mapping[str, list]) -> list[RankChange]:
+    changes = []
+    for slot in dict.fromkeys([*new, *old]):
+        old_ranks = {e['name']: e['rank'] for e in old.get(slot, ())}
+        new_ranks = {e['name']: e['rank'] for e in new.get(slot, ())}
+        for name in dict.fromkeys([*new_ranks, *old_ranks]):
+            if old_ranks.get(name) != new_ranks.get(name):
+                changes.append(RankChange(ship, slot, name, old_ranks.get(name), new_ranks.get(name)))
+    return changes
+
+
+def diff_site_data(old: RawSiteData, new: RawSiteData) -> DataDelta:
+    delta = DataDelta()
+
+    old_usages = {u['ship']: u for u in old.usages}
+    new_usages = {u['ship']: u for u in new.usages}
+
+    delta.ships_added, delta.ships_removed, common = _diff_keys(old_usages, new_usages)
+    for ship in common:
+        old_usage, new_usage = old_usages[ship], new_usages[ship]
+        if old_usage.get('description') != new_usage.get('description'):
+            delta.descriptions_changed.append(ship)
+        delta.rank_changes.extend(_diff_slots(ship, old_usage['equipment'], new_usage['equipment']))
+
+    delta.equipment_added, delta.equipment_removed, _ = _diff_keys(old.equipment, new.equipment)
+    delta.ship_changes = _diff_records(old.ships, new.ships)
+    delta.equipment_changes = _diff_records(old.equipment, new.equipment)
+
+    return delta
+
+
+#region Changelog rendering
+
+def _rank_name(rank: str) -> str:
+    return EquipmentRank[rank].name.capitalize()
+
+
+def _render_rank_change(c: RankChange) -> str:
+    if c.old_rank is None:
+        change = f'added as {_rank_name(c.new_rank)}'
+    elif c.new_rank is None:
+        change = f'removed, was {_rank_name(c.old_rank)}'
+    else:
+        change = f'{_rank_name(c.old_rank)} --> {_rank_name(c.new_rank)}'
+
+    return f'{c.ship} slot {c.slot}: {c.equipment} ({change})'
+
+
+def _render_field_change(c: FieldChange) -> str:
+    return f'{c.name} {c.field.replace("_", " ")} ({c.old} --> {c.new})'
+
+
+def _render_section(lines: list[str], heading: str, items: list, render: Callable[[Any], str] = str):
+    if items:
+        lines.append(f'- {heading}:')
+        lines.extend(f'    - {render(i)}' for i in items)
+
+
+def render_changelog_entry(delta: DataDelta, entry_date: date) -> str:
+    lines = [f'## {entry_date:%d/%m}', '']
+
+    _render_section(lines, 'Added the following ships', delta.ships_added)
+    _render_section(lines, 'Removed the following ships', delta.ships_removed)
+    _render_section(lines, 'Updated the following equipment recommendations', delta.rank_changes, _render_rank_change)
+    _render_section(lines, 'Updated descriptions for the following ships', delta.descriptions_changed)
+    _render_section(lines, 'Added the following equipment', delta.equipment_added)
+    _render_section(lines, 'Removed the following equipment', delta.equipment_removed)
+    _render_section(lines, 'Updated ship data', delta.ship_changes, _render_field_change)
+    _render_section(lines, 'Updated equipment data', delta.equipment_changes, _render_field_change)
+
+    return '\n'.join(lines) + '\n'
+
+
+def add_changelog_entry(entry: str, entry_date: date, path: Path = CHANGELOG_PATH):
+    """
+    Inserts entry as the newest entry under the heading for its year,
+    adding the year heading if it does not exist yet.
+    """
+    text = path.read_text(encoding='utf-8')
+    year_heading = f'# {entry_date.year}\n'
+
+    if (match := re.search(f'^{re.escape(year_heading)}\n?', text, re.MULTILINE)):
+        insert_at = match.end()
+        insertion = entry + '\n'
+    else:
+        # Newest year goes first, right after the front matter
+        first_year = re.search(r'^# ', text, re.MULTILINE)
+        insert_at = first_year.start() if first_year else len(text)
+        insertion = year_heading + '\n' + entry + '\n\n'
+
+    path.write_text(text[:insert_at] + insertion + text[insert_at:], encoding='utf-8', newline='')
+    print('Updated', path)
+
+#endregion
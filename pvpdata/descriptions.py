@@ -0,0 +1,111 @@
+"""
+Renders ship usage descriptions from Markdown to HTML, so the site inserts the
+HTML directly instead of converting every description on every build.
+
+Raw HTML in descriptions is escaped, and links may only use web and mail
+schemes. Rendered HTML is cached by a hash of the description, so only edited
+descriptions are rendered again.
+"""
+
+from __future__ import annotations
+
+from collections.abc import Iterable
+from hashlib import sha256
+from html import unescape as html_unescape
+import json
+from pathlib import Path
+import re
+from typing import TYPE_CHECKING
+from urllib.parse import urlparse
+
+from . import PROJECT_ROOT
+from .sitefiles import write_pvp_json_data
+from .types import ShipUsage
+from .util import lazy_import
+
+if TYPE_CHECKING:
+    import markdown
+else:
+    # Only loaded when a description is not in the cache
+    markdown = lazy_import('markdown')
+
+DESCRIPTION_CACHE_PATH = PROJECT_ROOT / '.cache' / 'description_html.json'
+
+# Increment when rendering changes, including Markdown package upgrades that
+# change its output, to render every description again
+RENDER_VERSION = 2
+
+SAFE_URL_SCHEMES = {'', 'http', 'https', 'mailto'}
+
+# Browsers ignore these anywhere in a URL, so "java\tscript:" is still javascript
+_IGNORED_URL_CHARS = re.compile(r'[\x00-\x20\x7f]')
+
+
+def url_scheme(url: str) -> str:
+    """Returns the scheme a browser would use for an attribute's URL."""
+    # Entities are decoded by the browser before the URL is parsed
+    return urlparse(_IGNORED_URL_CHARS.sub('', html_unescape(url))).scheme.lower()
+
+
+def _make_markdown() -> markdown.Markdown:
+    class SafeLinks(markdown.treeprocessors.Treeprocessor):
+        def run(self, root):
+            for element in root.iter():
+                for attr in ('href', 'src'):
+                    url = element.get(attr)
+                    if url is not None and url_scheme(url) not in SAFE_URL_SCHEMES:
+                        del element.attrib[attr]
+
+    md = markdown.Markdown(output_format='html')
+    # Escape raw HTML instead of passing it through
+    md.preprocessors.deregister('html_block')
+    md.inlinePatterns.deregister('html')
+    # After inline patterns create the links
+    md.treeprocessors.register(SafeLinks(md), 'safe_links', 1)
+    return md
+
+
+def description_key(description: str) -> str:
+    return sha256(f'{RENDER_VERSION}\0{description}'.encode('utf-8')).hexdigest()
+
+
+class DescriptionRenderer:
+    _cache: dict[str, str]
+
+    def __init__(self, cache_path: Path = DESCRIPTION_CACHE_PATH):
+        self.cache_path = cache_path
+        self.rendered = 0
+        self._md = None
+
+        if cache_path.is_file():
+            with open(cache_path, encoding='utf-8') as f:
+                self._cache = json.load(f)
+        else:
+            self._cache = {}
+
+    def render(self, description: str) -> str:
+        key = description_key(description)
+        if (html := self._cache.get(key)) is None:
+            if self._md is None:
+                self._md = _make_markdown()
+
+            html = self._cache[key] = self._md.reset().convert(description)
+            self.rendered += 1
+
+        return html
+
+    def save(self):
+        if self.rendered:
+            self.cache_path.parent.mkdir(parents=True, exist_ok=True)
+            write_pvp_json_data(self.cache_path, self._cache)
+
+
+def render_descriptions(usages: Iterable[ShipUsage], cache_path: Path = DESCRIPTION_CACHE_PATH):
+    """Sets the rendered HTML of each usage's description."""
+    renderer = DescriptionRenderer(cache_path)
+
+    for usage in usages:
+        usage.description_html = renderer.render(usage.description) if usage.description else None
+
+    print('Rendered', renderer.rendered, 'new or edited descriptions')
+    renderer.save()
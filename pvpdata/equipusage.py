@@ -0,0 +1,107 @@
+"""
+Reverse index from equipment to the ships that use it.
+
+Usage data is stored per ship. This index answers the opposite question, such
+as which ships run a gun as optimal in slot 1, without scanning every usage.
+"""
+
+from collections import defaultdict
+from collections.abc import Iterable
+from dataclasses import dataclass
+from typing import Any
+
+from . import DATA_DIR
+from .sitefiles import load_site_data
+from .sitefiles import write_pvp_json_data
+from .types import Equipment
+from .types import EquipmentRank
+from .types import Ship
+from .types import ShipUsage
+
+EQUIPMENT_USAGE_PATH = DATA_DIR / 'equipment_usage.json'
+
+
+@dataclass(frozen=True)
+class EquipmentUse:
+    ship: Ship
+    slot: int | str
+    rank: EquipmentRank
+
+    def __str__(self):
+        return f'{self.ship.name} slot {self.slot} ({self.rank.name.lower()})'
+
+
+# Lookup key: equipment name, slot, rank. None matches any slot or rank.
+_IndexKey = tuple[str, int | str | None, EquipmentRank | None]
+
+
+class EquipmentUsageIndex:
+    _uses: dict[_IndexKey, list[EquipmentUse]]
+
+    def __init__(self):
+        self._uses = defaultdict(list)
+
+    @classmethod
+    def from_usages(cls, usages: Iterable[ShipUsage]) -> 'EquipmentUsageIndex':
+        index = cls()
+        for usage in usages:
+            index.add(usage)
+        return index
+
+    def add(self, usage: ShipUsage):
+        for slot, equips in usage.slots.items():
+            for ewr in equips:
+                use = EquipmentUse(usage.ship, slot, ewr.rank)
+                name = ewr.equip.name
+                # Store every combination of filters so each query is a single dict lookup
+                for key in (
+                    (name, None, None),
+                    (name, slot, None),
+                    (name, None, ewr.rank),
+                    (name, slot, ewr.rank),
+                ):
+                    self._uses[key].append(use)
+
+    def uses(
+        self,
+        equip: Equipment | str,
+        slot: int | str | None = None,
+        rank: EquipmentRank | None = None,
+    ) -> list[EquipmentUse]:
+        name = equip.name if isinstance(equip, Equipment) else equip
+        # Don't use [] on the defaultdict, which would add empty entries
+        return list(self._uses.get((name, slot, rank), ()))
+
+    def ships(
+        self,
+        equip: Equipment | str,
+        slot: int | str | None = None,
+        rank: EquipmentRank | None = None,
+    ) -> list[Ship]:
+        # A ship can list the same equipment in more than one slot
+        return list({u.ship: None for u in self.uses(equip, slot, rank)})
+
+    @property
+    def equipment_names(self) -> list[str]:
+        return sorted({name for name, slot, rank in self._uses})
+
+    def to_json_data(self) -> dict[str, list[dict[str, Any]]]:
+        return {
+            name: [
+                {'ship': u.ship.name, 'slot': str(u.slot), 'rank': str(u.rank)}
+                for u in self._uses[(name, None, None)]
+            ]
+            for name in self.equipment_names
+        }
+
+
+def write_equipment_usage(usages: Iterable[ShipUsage]):
+    write_pvp_json_data(EQUIPMENT_USAGE_PATH, EquipmentUsageIndex.from_usages(usages).to_json_data())
+
+
+def main():
+    write_equipment_usage(load_site_data().usages)
+
+
+if '__main__' == __name__:
+    main()
@@ -3,16 +3,22 @@ Functions and information for working with external data sources, including
 the wiki and the resources repository.
 """
 
+from __future__ import annotations
+
+from collections.abc import Callable
+from collections.abc import Mapping
+from dataclasses import dataclass
 from datetime import timedelta
+from functools import partial
 import json
 import re
+import threading
+from types import MappingProxyType
+from typing import TYPE_CHECKING
+from urllib.parse import quote as urlquote
 from urllib.parse import urlparse
 from urllib.parse import ParseResult as UrlParseResult
 
-from mediawiki import MediaWiki
-from mediawiki import MediaWikiPage
-import more_itertools as mit
-
 from . import GAME_RESOURCES_DIR
 from .types import EQUIP_RARITY_BY_STARS
 from .types import Equipment
@@ -20,17 +26,129 @@ from .types import Ship
 from .types import ShipRarity
 from .types import HullClass
 from .types import TechLevel
+from .util import LazyValue
+from .util import lazy_import
+
+if TYPE_CHECKING:
+    import mediawiki
+    import more_itertools as mit
+else:
+    # Only loaded when pages are actually fetched or parsed
+    mediawiki = lazy_import('mediawiki')
+    mit = lazy_import('more_itertools')
+
+
+@dataclass(frozen=True)
+class Wiki:
+    api_url: str
+    # Page URLs are this followed by the encoded page title
+    article_url: str
+    # Applies to all requests to the wiki, however many regions use it
+    rate_limit_wait: timedelta
+
+    def page_url(self, title: str) -> str:
+        """Returns the URL the wiki itself gives for a page, like MediaWikiPage.url."""
+        # Same characters left unencoded as MediaWiki's wfUrlencode
+        return self.article_url + urlquote(title.replace(' ', '_'), safe=';@$!*(),/~:')
+
+
+# Data assembly parses the EN wiki's templates and categories, so every region
+# resolves pages against it. A region can be pointed at another wiki with the
+# same page structure.
+EN_WIKI = Wiki(
+    'https://azurlane.koumakan.jp/w/api.php',
+    'https://azurlane.koumakan.jp/wiki/',
+    timedelta(seconds=.25),
+)
+
+
+@dataclass(frozen=True)
+class Region:
+    """A game server region with its own guide."""
+    code: str
+    wiki: Wiki
+    # Matched against file names in the exports directory
+    export_glob: str
+    # Appended to data file basenames for this region's usage data
+    data_file_suffix: str
+
+
+REGIONS: Mapping[str, Region] = MappingProxyType({
+    r.code: r for r in [
+        Region('EN', EN_WIKI, 'Azur Lane EN PvP Guide *.html', ''),
+        Region('CN', EN_WIKI, 'Azur Lane CN PvP Guide *.html', '_cn'),
+        Region('JP', EN_WIKI, 'Azur Lane JP PvP Guide *.html', '_jp'),
+    ]
+})
 
+DEFAULT_REGION = REGIONS['EN']
 
-def get_wiki_client() -> MediaWiki:
-    return MediaWiki(
-        'https://azurlane.koumakan.jp/w/api.php',
+
+def get_wiki_client(wiki: Wiki = EN_WIKI) -> mediawiki.MediaWiki:
+    return mediawiki.MediaWiki(
+        wiki.api_url,
         rate_limit=True,
-        rate_limit_wait=timedelta(seconds=.25),
+        rate_limit_wait=wiki.rate_limit_wait,
         user_agent='custom script/0.0 PVP site data maintenance (Please contact azurstarshine if there is a problem.)'
     )
 
 
+class LockedPage:
+    """
+    Wiki page whose lazily loaded properties are requested while holding its
+    client's lock. Only the properties read by data assembly are provided.
+    """
+
+    def __init__(self, page: mediawiki.MediaWikiPage, lock: threading.Lock):
+        self._page = page
+        self._lock = lock
+        # Loaded with the page
+        self.title = page.title
+        self.url = page.url
+
+    @property
+    def categories(self) -> list[str]:
+        with self._lock:
+            return self._page.categories
+
+    @property
+    def wikitext(self) -> str:
+        with self._lock:
+            return self._page.wikitext
+
+
+class SharedWikiClient:
+    """
+    Wiki client that threads can share. Requests are sent one at a time, so
+    all threads together stay within the wiki's rate limit, while the pages
+    themselves are processed in parallel. Only connects when the first page is
+    requested, so runs that resolve everything offline never contact the wiki.
+    """
+
+    def __init__(self, connect: Callable[[], mediawiki.MediaWiki]):
+        self._lock = threading.Lock()
+        self._client = LazyValue(connect)
+
+    def page(self, *args, **kwargs) -> LockedPage:
+        with self._lock:
+            return LockedPage(self._client.value.page(*args, **kwargs), self._lock)
+
+
+_shared_wiki_clients: dict[Wiki, SharedWikiClient] = {}
+_shared_wiki_clients_lock = threading.Lock()
+
+
+def get_shared_wiki_client(region: Region = DEFAULT_REGION) -> SharedWikiClient:
+    """
+    Returns the client shared by every region using the same wiki, so the
+    regions share the wiki's rate limit instead of each adding their own load.
+    """
+    with _shared_wiki_clients_lock:
+        if (shared := _shared_wiki_clients.get(region.wiki)) is None:
+            shared = _shared_wiki_clients[region.wiki] = SharedWikiClient(partial(get_wiki_client, region.wiki))
+        return shared
+
+
 SHIP_RARITY_BY_CATEGORY = {r.long_name.lower() + ' ships': r for r in ShipRarity}
 
 RETROFIT_CATEGORY = 'ships with retrofit'
@@ -49,6 +167,14 @@ HULL_CLASS_BY_CATEGORY = {hull_class_category_name(hc): hc for hc in HullClass}
 
 ExternalData = Ship | Equipment
 
+
+def identity_key(data: ExternalData) -> tuple[type, int]:
+    """Key that identifies the same ship or equipment across wikis and page names."""
+    if isinstance(data, Ship):
+        return Ship, data.gid
+    else:
+        return Equipment, data.image_id
+
 EQUIPMENT_CATEGORY = 'equipment'
 SHIP_CATEGORY = 'ships'
 
@@ -56,6 +182,18 @@ DATA_TYPE_CATEGORIES = {EQUIPMENT_CATEGORY, SHIP_CATEGORY}
 
 #region Data assembly
 
+def find_skin_id(skin_data, gid: int, retrofit: bool, title: str) -> int:
+    skin_type = 'retrofit' if retrofit else 'default'
+
+    skin = mit.one(
+        [s for s in skin_data[str(gid)]['skins'].values() if s['type'].lower() == skin_type],
+        ValueError(f'No {skin_type} skin found for {title} ({gid})'),
+        ValueError(f'Multiple {skin_type} skins found for {title} ({gid})'),
+    )
+
+    return int(skin['id'])
+
+
 def _assemble_ship_data(
     skin_data,
     title: str,
@@ -106,14 +244,6 @@ def _assemble_ship_data(
             ),
         )]
 
-    skin_type = 'retrofit' if retrofit else 'default'
-
-    skin = mit.one(
-        [s for s in skin_data[str(gid)]['skins'].values() if s['type'].lower() == skin_type],
-        ValueError(f'No {skin_type} skin found for {title} ({gid})'),
-        ValueError(f'Multiple {skin_type} skins found for {title} ({gid})'),
-    )
-
     return Ship(
         title,
         nickname,
@@ -122,7 +252,7 @@ def _assemble_ship_data(
         rarity,
         retrofit,
         hull_class,
-        int(skin['id']),
+        find_skin_id(skin_data, gid, retrofit, title),
     )
 
 
@@ -181,10 +311,18 @@ def _assemble_equip_data(
         image_id,
     )
 
+
+# Functions that build records from page content, for profiling
+ASSEMBLERS = (_assemble_ship_data, _assemble_equip_data)
+
 #endregion
 
 
-def load_external_data(ship_skin_data, nickname: str, page: MediaWikiPage) -> ExternalData:
+def load_external_data(
+    ship_skin_data,
+    nickname: str,
+    page: mediawiki.MediaWikiPage | LockedPage,
+) -> ExternalData:
     categories = {c.lower() for c in page.categories}
 
     recognized = categories.intersection(DATA_TYPE_CATEGORIES)
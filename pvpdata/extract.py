@@ -6,28 +6,41 @@ This program reads from an HTML export of the spreadsheet. It is only tested
 against an export from LibreOffice 24.8.2.1.
 """
 
+from __future__ import annotations
+
+import argparse
+from collections.abc import Iterable
 from collections.abc import Iterator
 from collections.abc import Mapping
 from dataclasses import dataclass
 import json
 from operator import attrgetter
+from pathlib import Path
+import sys
 from time import sleep
+from typing import TYPE_CHECKING
 from urllib.parse import unquote as urlunquote
 from urllib.parse import urlparse
 from urllib.parse import ParseResult as UrlParseResult
 import warnings
 
-import bs4
-from bs4 import BeautifulSoup
-from mediawiki import MediaWiki
-import more_itertools as mit
-
+from . import PROFILE_DIR
 from . import PROJECT_ROOT
+from .equipusage import write_equipment_usage
+from .external import DEFAULT_REGION
+from .external import ASSEMBLERS
 from .external import ExternalData
-from .external import get_wiki_client
+from .external import Region
+from .external import SharedWikiClient
+from .external import get_shared_wiki_client
 from .external import load_external_data
 from .external import load_skin_data
+from .search import build_search_index
+from .search import write_search_index
+from .sitefiles import DEPLOY_DATA_DIR
+from .sitefiles import SiteData
 from .sitefiles import get_data_path
+from .sitefiles import write_deploy_json_data
 from .sitefiles import write_pvp_json_data
 from .types import EQUIP_RANK_BY_COLOR
 from .types import EquipWithRank
@@ -36,6 +49,25 @@ from .types import Ship
 from .types import ShipUsage
 from .util import LazyValue
 from .util import MultikeyCache
+from .util import lazy_import
+
+if TYPE_CHECKING:
+    import bs4
+    from mediawiki import MediaWiki
+    import more_itertools as mit
+
+    from .gamefiles import GameDataResolver
+else:
+    # Only loaded when a guide is actually parsed, so importing this module
+    # for its constants or helpers stays fast
+    bs4 = lazy_import('bs4')
+    mit = lazy_import('more_itertools')
+
+EXPORTS_DIR = PROJECT_ROOT / 'exports'
+EXPORT_GLOB = DEFAULT_REGION.export_glob
+
+# Named anchors of the equipment tables in the export
+GUIDE_TABLE_NAMES = ['table4', 'table5']
 
 # Manual overrides for broken page names
 PAGE_NAME_FIXES = {
@@ -79,12 +111,63 @@ def extract_data_sheets_value(cell) -> str | None:
     return data_sheets_value.get('2')
 
 
+def load_page_data(
+    client: MediaWiki | SharedWikiClient,
+    ship_skin_data,
+    cache: MultikeyCache[str, ExternalData],
+    url: UrlParseResult,
+    nickname: str,
+    resolver: GameDataResolver | None = None,
+) -> tuple[ExternalData, bool]:
+    """
+    Returns the ship or equipment data for the wiki page at url and whether it
+    was cached. The page is only loaded if none of its names are cached.
+    """
+    # Cache keys are interned to share memory with the names in the records
+    raw_page_name = sys.intern(extract_page_name(url))
+    page_name = sys.intern(PAGE_NAME_FIXES.get(raw_page_name, raw_page_name))
+    lazypage = LazyValue(lambda: client.page(page_name, auto_suggest=False))
+
+    resolvable = resolver is not None and resolver.can_resolve(page_name)
+
+    # Use a generator function to avoid loading the page if not needed
+    def names():
+        if page_name != raw_page_name:
+            yield raw_page_name
+        yield page_name
+        # Resolves wiki redirects. Not needed when resolving offline.
+        if not resolvable:
+            yield sys.intern(lazypage.value.title)
+
+    def fetch():
+        if resolvable:
+            return resolver.resolve(page_name, nickname)
+        return load_external_data(ship_skin_data, nickname, lazypage.value)
+
+    return cache.get(
+        names(),
+        # Must NOT use partial to ensure page is loaded lazily
+        fetch,
+    )
+
+
 def parse_equip_table(
-    client: MediaWiki,
+    client: MediaWiki | SharedWikiClient,
     ship_skin_data,
     cache: MultikeyCache[str, ExternalData],
     table: bs4.Tag,
+    interactive: bool = True,
+    resolver: GameDataResolver | None = None,
 ):
+    """
+    Parses ship usages from an equipment table.
+
+    With a resolver, ships and equipment the game data can identify are
+    resolved offline, and the wiki is only used for the rest.
+
+    When interactive, pauses after each ship and each error so the output
+    can be followed while it scrolls.
+    """
     usages = []
     failures = []
     current_usage = None
@@ -100,23 +183,7 @@ def parse_equip_table(
 
                 url: UrlParseResult = urlparse(urltext)
 
-                raw_page_name = extract_page_name(url)
-                page_name = PAGE_NAME_FIXES.get(raw_page_name, raw_page_name)
-                lazypage = LazyValue(lambda: client.page(page_name, auto_suggest=False))
-
-                # Use a generator function to avoid loading the page if not needed
-                def names():
-                    if page_name != raw_page_name:
-                        yield raw_page_name
-                    yield page_name
-                    # Resolves wiki redirects
-                    yield lazypage.value.title
-
-                page_data, cached = cache.get(
-                    names(),
-                    # Must NOT use partial to ensure page is loaded lazily
-                    lambda: load_external_data(ship_skin_data, nickname, lazypage.value)
-                )
+                page_data, cached = load_page_data(client, ship_skin_data, cache, url, nickname, resolver)
 
                 if page_data.nickname != nickname:
                     warnings.warn(f'Nickname mismatch: {page_data.nickname} (first) != {nickname} (new) ({page_data.name} data)')
@@ -136,7 +203,8 @@ def parse_equip_table(
                         current_usage.validate()
                         usages.append(current_usage)
                         print('Completed ship usage', current_usage)
-                        sleep(1)
+                        if interactive:
+                            sleep(1)
 
                     current_usage = ShipUsage(page_data)
                     print()
@@ -148,7 +216,7 @@ def parse_equip_table(
 
                         rank = EQUIP_RANK_BY_COLOR[cell.attrs['bgcolor'].lower()]
 
-                        current_usage.slots[slot].append(EquipWithRank(page_data, rank))
+                        current_usage.slots[slot].append(EquipWithRank.shared(page_data, rank))
                     else:
                         warnings.warn(f'Found equipment outside ship: {page_data.name}')
 
@@ -187,7 +255,8 @@ def parse_equip_table(
                 print(loc, 'No ship found yet')
         except Exception as ex:
             print('Error:', loc, cell, ex)
-            sleep(5)
+            if interactive:
+                sleep(5)
             failures.append((loc, cell, current_usage, ex))
             # Skip over current ship
             current_usage = None
@@ -195,44 +264,47 @@ def parse_equip_table(
     return usages, failures
 
 
-def main():
-    with open((PROJECT_ROOT / 'exports/Azur Lane EN PvP Guide 2024-10-20.html').resolve(), encoding='utf-8') as f:
-        soup = BeautifulSoup(f, 'lxml')
+def find_latest_export(exports_dir: Path = EXPORTS_DIR, export_glob: str = EXPORT_GLOB) -> Path:
+    # Export file names end with the guide date, so the last name is the newest guide
+    exports = sorted(exports_dir.glob(export_glob))
+    if not exports:
+        raise FileNotFoundError(f'No exports matching {export_glob} in {exports_dir}')
+    return exports[-1]
 
-    client = get_wiki_client()
-    ship_skin_data = load_skin_data()
-    cache = MultikeyCache()
 
-    usages = []
-    failures = []
+def load_export(path: Path) -> bs4.BeautifulSoup:
+    with open(path.resolve(), encoding='utf-8') as f:
+        return bs4.BeautifulSoup(f, 'lxml')
 
-    for table_name in ['table4', 'table5']:
-        table_element: bs4.Tag = soup.find('a', {'name': table_name}).find_next('table')
-        cur_uses, cur_fails = parse_equip_table(client, ship_skin_data, cache, table_element)
-        usages.extend(cur_uses)
-        failures.extend((table_name, *f) for f in cur_fails)
 
-    print()
+def find_guide_tables(soup: bs4.BeautifulSoup) -> dict[str, bs4.Tag]:
+    return {
+        table_name: soup.find('a', {'name': table_name}).find_next('table')
+        for table_name in GUIDE_TABLE_NAMES
+    }
 
+
+def report_problems(values: Iterable[ExternalData], failures):
     print()
     print('Conflicting nicknames:')
     by_nickname = mit.map_reduce(
-        cache.allvalues,
+        values,
         keyfunc=attrgetter('nickname'),
         valuefunc=attrgetter('name'),
     )
     for nickname, names in by_nickname.items():
         if len(names) > 1:
-            print('{nickname}: ' + ','.join(names))
+            print(f'{nickname}: ' + ','.join(names))
 
     print()
     print('Failed to load:')
     for f in failures:
         print(*f)
 
-    print()
+
+def write_reference_data(values: Iterable[ExternalData]) -> dict[type, dict[str, ExternalData]]:
     data_by_types = mit.map_reduce(
-        cache.allvalues,
+        values,
         keyfunc=type,
         # Ensure output is sorted to minimize diffs
         # dict preserves insertion order in current version of Python.
@@ -240,8 +312,106 @@ def main():
     )
     for t, data in data_by_types.items():
         write_pvp_json_data(get_data_path(t), data)
+        write_deploy_json_data(get_data_path(t, DEPLOY_DATA_DIR), data)
+
+    return data_by_types
+
+
+def write_usage_data(
+    data_by_types: Mapping[type, dict[str, ExternalData]],
+    usages: list[ShipUsage],
+    region: Region = DEFAULT_REGION,
+):
+    # Hashing and Markdown are only needed when data is written
+    from .descriptions import render_descriptions
+    render_descriptions(usages)
+    write_pvp_json_data(get_data_path(ShipUsage, suffix=region.data_file_suffix), usages)
+    write_deploy_json_data(get_data_path(ShipUsage, DEPLOY_DATA_DIR, region.data_file_suffix), usages)
+
+    # Pages built from derived data only cover the default region's guide
+    if region == DEFAULT_REGION:
+        write_equipment_usage(usages)
+
+        site_data = SiteData(data_by_types.get(Ship, {}), data_by_types.get(Equipment, {}), usages)
+        write_search_index(build_search_index(site_data).items())
+
+        # NumPy is slow to import, so only import it when data is written
+        from .loadouts import write_loadout_analysis
+        write_loadout_analysis(usages)
+
+
+def write_site_data(values: Iterable[ExternalData], usages: list[ShipUsage]):
+    write_usage_data(write_reference_data(values), usages)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        'export',
+        nargs='?',
+        type=Path,
+        help=f'HTML export of the guide. Defaults to the newest export in {EXPORTS_DIR.name}.',
+    )
+    parser.add_argument(
+        '--offline',
+        action='store_true',
+        help='Resolve ship and equipment metadata from the gamefiles data, using the wiki only when needed.',
+    )
+    parser.add_argument(
+        '--profile',
+        nargs='?',
+        type=Path,
+        const=PROFILE_DIR,
+        metavar='DIR',
+        help=(
+            'Record memory use per phase and CPU and wall time stacks while parsing tables, '
+            f'and write reports to DIR (default {PROFILE_DIR.relative_to(PROJECT_ROOT)}). '
+            'Disables pauses after each ship and error. Makes extraction considerably slower.'
+        ),
+    )
+    args = parser.parse_args()
+
+    # Imported after parsing arguments so --help stays fast
+    from .gamefiles import GameDataResolver
+    from .profiling import ExtractionProfiler
+
+    profiler = ExtractionProfiler(args.profile, [parse_equip_table, *ASSEMBLERS, GameDataResolver.resolve])
+    with profiler:
+        with profiler.phase('parse export'):
+            soup = load_export(args.export or find_latest_export())
+
+        with profiler.phase('load skin and game data'):
+            resolver = GameDataResolver.load() if args.offline else None
+
+            # Only connects if a page has to be loaded from the wiki
+            client = get_shared_wiki_client()
+            ship_skin_data = resolver.skin_data if resolver else load_skin_data()
+            cache = MultikeyCache()
+
+        usages = []
+        failures = []
+
+        with profiler.phase('extract tables'):
+            for table_name, table_element in find_guide_tables(soup).items():
+                cur_uses, cur_fails = parse_equip_table(
+                    client,
+                    ship_skin_data,
+                    cache,
+                    table_element,
+                    # Pauses would dominate the sampled stacks
+                    interactive=not profiler.enabled,
+                    resolver=resolver,
+                )
+                usages.extend(cur_uses)
+                failures.extend((table_name, *f) for f in cur_fails)
+
+        print()
+
+        report_problems(cache.allvalues, failures)
 
-    write_pvp_json_data(get_data_path(type(usages[0])), usages)
+        print()
+        with profiler.phase('write data'):
+            write_site_data(cache.allvalues, usages)
 
 
 if '__main__' == __name__:
@@ -0,0 +1,396 @@
+"""
+Resolves ship and equipment metadata offline from the JSON data files in the
+game resources clone (see the gamefiles tasks).
+
+Lookups are indexed by name and alias, so resolving a page the guide links to
+is a dict lookup instead of a wiki request. The wiki is only needed for names
+the game data does not know or cannot tell apart.
+
+Records use the game's own field names and numeric codes, listed below. Both
+files are either a list of records or an object of records keyed by ID:
+
+    ship_list.json:
+    {"gid": 10802, "name": "Ägir", "aliases": ["Aegir"], "rarity": 6,
+     "research": true, "type": 18, "retrofit": false}
+    {"gid": 20208, "name": "Ayanami", "rarity": 4, "research": false,
+     "type": 1, "retrofit": true, "retrofit_type": 1}
+
+    equipment_list.json (one record per tech level):
+    {"name": "Gyroscope", "rarity": 4, "tech": "T3", "icon": 18040}
+
+Records that cannot be read are skipped and reported, and their names are left
+to the wiki. That includes ships with rarity 5 or 6 and no research field,
+since those numbers are shared by Super Rare and Priority, and Ultra Rare and
+Decisive ships.
+
+The game data is maintained separately from the wiki, so records assembled
+from each can be compared with cross_check to catch mistakes in either.
+"""
+
+from collections import defaultdict
+from collections.abc import Callable
+from collections.abc import Iterable
+from collections.abc import Mapping
+from dataclasses import dataclass
+import json
+from pathlib import Path
+from typing import Any
+from typing import TypeVar
+
+from . import GAME_RESOURCES_DIR
+from .external import EN_WIKI
+from .external import ExternalData
+from .external import Wiki
+from .external import find_skin_id
+from .external import load_skin_data
+from .types import EQUIP_RARITY_BY_STARS
+from .types import Equipment
+from .types import HullClass
+from .types import Ship
+from .types import ShipRarity
+from .types import TechLevel
+
+SHIP_DATA_PATH = GAME_RESOURCES_DIR / 'ship_list.json'
+EQUIPMENT_DATA_PATH = GAME_RESOURCES_DIR / 'equipment_list.json'
+
+R = TypeVar('R')
+
+# Ship record fields
+# Group ID shared by all of a ship's templates. Not "id", which is the template ID.
+GID_FIELD = 'gid'
+NAME_FIELD = 'name'
+ALIASES_FIELD = 'aliases'
+SHIP_RARITY_FIELD = 'rarity'
+# Whether a ship is a research ship, which the game calls blueprint ships
+RESEARCH_FIELD = 'research'
+# Numeric ship type (see HULL_CLASS_BY_SHIP_TYPE)
+HULL_CLASS_FIELD = 'type'
+RETROFIT_FIELD = 'retrofit'
+RETROFIT_HULL_CLASS_FIELD = 'retrofit_type'
+
+# Equipment record fields
+STARS_FIELD = 'rarity'
+TECH_LEVEL_FIELD = 'tech'
+IMAGE_ID_FIELD = 'icon'
+
+
+def normalize_name(name: str) -> str:
+    # Page names from URLs use underscores for spaces
+    return ' '.join(name.replace('_', ' ').split()).casefold()
+
+
+def _field(record: Mapping[str, Any], field: str, default: Any = ...) -> Any:
+    value = record.get(field)
+    if value in (None, ''):
+        if default is ...:
+            raise ValueError(f'No {field} field')
+        return default
+
+    # Localized values are keyed by language
+    if isinstance(value, Mapping) and 'en' in value:
+        value = value['en']
+    return value
+
+
+# Numeric rarities as used by the game. Research ships use the same numbers as
+# the rarities they share colors with.
+SHIP_RARITY_BY_NUMBER = {
+    2: ShipRarity.N,
+    3: ShipRarity.R,
+    4: ShipRarity.E,
+    5: ShipRarity.SR,
+    6: ShipRarity.UR,
+}
+RESEARCH_SHIP_RARITY_BY_NUMBER = {
+    5: ShipRarity.PR,
+    6: ShipRarity.DR,
+}
+
+
+def _parse_ship_rarity(value, research: bool | None) -> ShipRarity:
+    if isinstance(value, int):
+        if value in RESEARCH_SHIP_RARITY_BY_NUMBER and research is None:
+            raise ValueError(f'Rarity {value} with no {RESEARCH_FIELD} field could be a research ship')
+
+        try:
+            return (RESEARCH_SHIP_RARITY_BY_NUMBER if research else SHIP_RARITY_BY_NUMBER)[value]
+        except KeyError:
+            raise ValueError(f'Unknown {"research " if research else ""}ship rarity {value}') from None
+
+    text = str(value).strip()
+    for r in ShipRarity:
+        if text.upper() == r.code or text.lower() == r.long_name.lower():
+            return r
+    raise ValueError(f'Unknown ship rarity {value}')
+
+
+# The game's numeric ship types. Types without a hull class here are not used in PvP.
+HULL_CLASS_BY_SHIP_TYPE = {
+    1: HullClass.DD,
+    2: HullClass.CL,
+    3: HullClass.CA,
+    4: HullClass.BC,
+    5: HullClass.BB,
+    6: HullClass.CVL,
+    7: HullClass.CV,
+    8: HullClass.SS,
+    10: HullClass.BBV,
+    12: HullClass.AR,
+    13: HullClass.BM,
+    17: HullClass.SSV,
+    18: HullClass.CB,
+    19: HullClass.AE,
+    22: HullClass.IXs,
+    23: HullClass.IXv,
+    24: HullClass.IXm,
+}
+
+
+def _parse_hull_class(value) -> HullClass:
+    if isinstance(value, int):
+        try:
+            return HULL_CLASS_BY_SHIP_TYPE[value]
+        except KeyError:
+            raise ValueError(f'Unknown ship type {value}') from None
+
+    text = str(value).strip()
+    for hc in HullClass:
+        if text == hc.code or text.upper() == hc.code.upper():
+            return hc
+    return HullClass.find_by_long_name(text)
+
+
+def _parse_tech_level(value) -> TechLevel:
+    return TechLevel(int(str(value).strip().upper().removeprefix('T')))
+
+
+@dataclass(frozen=True, slots=True)
+class ShipRecord:
+    gid: int
+    name: str
+    aliases: tuple[str, ...]
+    # Rarity and hull class before any retrofit
+    rarity: ShipRarity
+    hull_class: HullClass
+    retrofit: bool
+    retrofit_hull_class: HullClass | None
+
+    @classmethod
+    def from_json(cls, record: Mapping[str, Any]) -> 'ShipRecord':
+        rarity = _parse_ship_rarity(_field(record, SHIP_RARITY_FIELD), _field(record, RESEARCH_FIELD, None))
+        retrofit = bool(_field(record, RETROFIT_FIELD, False))
+        if retrofit and not rarity.can_retrofit:
+            raise ValueError(f'{rarity.long_name} ships cannot be retrofitted')
+
+        retrofit_hull = _field(record, RETROFIT_HULL_CLASS_FIELD, None)
+        aliases = _field(record, ALIASES_FIELD, ())
+        return cls(
+            int(_field(record, GID_FIELD)),
+            _field(record, NAME_FIELD),
+            (aliases,) if isinstance(aliases, str) else tuple(aliases),
+            rarity,
+            _parse_hull_class(_field(record, HULL_CLASS_FIELD)),
+            retrofit,
+            _parse_hull_class(retrofit_hull) if retrofit_hull else None,
+        )
+
+
+@dataclass(frozen=True, slots=True)
+class EquipmentRecord:
+    name: str
+    aliases: tuple[str, ...]
+    stars: int
+    tech_level: TechLevel
+    image_id: int
+
+    @classmethod
+    def from_json(cls, record: Mapping[str, Any]) -> 'EquipmentRecord':
+        stars = int(_field(record, STARS_FIELD))
+        if stars not in EQUIP_RARITY_BY_STARS:
+            raise ValueError(f'{stars} is not a valid number of equipment stars')
+
+        aliases = _field(record, ALIASES_FIELD, ())
+        return cls(
+            _field(record, NAME_FIELD),
+            (aliases,) if isinstance(aliases, str) else tuple(aliases),
+            stars,
+            _parse_tech_level(_field(record, TECH_LEVEL_FIELD)),
+            int(_field(record, IMAGE_ID_FIELD)),
+        )
+
+
+def _load_records(path: Path, parse: Callable[[Mapping[str, Any]], R]) -> list[R]:
+    with open(path, encoding='utf-8') as f:
+        data = json.load(f)
+
+    # Files are either a list of records or an object keyed by ID or name
+    records = []
+    skipped = []
+    for record in (data.values() if isinstance(data, Mapping) else data):
+        if not isinstance(record, Mapping):
+            skipped.append(f'{record!r}: not an object')
+            continue
+
+        try:
+            records.append(parse(record))
+        except (KeyError, TypeError, ValueError) as ex:
+            skipped.append(f'{record.get(NAME_FIELD, record)}: {ex}')
+
+    if skipped:
+        print(f'Skipped {len(skipped)} records in {path.name} that could not be read:')
+        for s in skipped:
+            print(' ', s)
+
+    return records
+
+
+class GameDataResolver:
+    _ships_by_gid: dict[int, ShipRecord]
+    _gids_by_name: dict[str, set[int]]
+    _equipment_by_name: dict[str, list[EquipmentRecord]]
+
+    def __init__(
+        self,
+        ships: Iterable[ShipRecord],
+        equipment: Iterable[EquipmentRecord],
+        skin_data,
+        wiki: Wiki = EN_WIKI,
+    ):
+        self.skin_data = skin_data
+        # Records link to the pages the wiki assembly would resolve
+        self.wiki = wiki
+
+        self._ships_by_gid = {}
+        self._gids_by_name = defaultdict(set)
+        for ship in ships:
+            self._ships_by_gid[ship.gid] = ship
+            for name in (ship.name, *ship.aliases):
+                self._gids_by_name[normalize_name(name)].add(ship.gid)
+
+        # One piece of equipment has a record per tech level under the same name
+        self._equipment_by_name = defaultdict(list)
+        for equip in equipment:
+            for name in dict.fromkeys(normalize_name(n) for n in (equip.name, *equip.aliases)):
+                self._equipment_by_name[name].append(equip)
+
+    @classmethod
+    def load(
+        cls,
+        ship_path: Path = SHIP_DATA_PATH,
+        equipment_path: Path = EQUIPMENT_DATA_PATH,
+    ) -> 'GameDataResolver':
+        for path in (ship_path, equipment_path):
+            if not path.is_file():
+                raise Exception(f'{path} does not exist or is not a file. Update gamefiles.')
+
+        return cls(
+            _load_records(ship_path, ShipRecord.from_json),
+            _load_records(equipment_path, EquipmentRecord.from_json),
+            load_skin_data(),
+        )
+
+    def ship_record(self, name: str) -> ShipRecord | None:
+        """Returns the ship with name or alias, or None if there is not exactly one."""
+        gids = self._gids_by_name.get(normalize_name(name), ())
+        return self._ships_by_gid[next(iter(gids))] if len(gids) == 1 else None
+
+    def equipment_records(self, name: str) -> list[EquipmentRecord]:
+        return list(self._equipment_by_name.get(normalize_name(name), ()))
+
+    def can_resolve(self, name: str) -> bool:
+        """Whether name is exactly one ship or one piece of equipment, but not both."""
+        is_ship = self.ship_record(name) is not None
+        equipment = self.equipment_records(name)
+
+        if not equipment:
+            return is_ship
+        if is_ship:
+            return False
+        # Equipment records with the same name are tech levels of the same
+        # equipment, unless their images differ
+        return len({r.image_id for r in equipment}) == 1
+
+    def resolve_ship(self, record: ShipRecord, nickname: str) -> Ship:
+        # Matches the wiki, which lists ships that can be retrofitted as retrofitted
+        retrofit = record.retrofit
+        rarity = record.rarity.retrofit_rarity if retrofit else record.rarity
+        hull_class = (record.retrofit_hull_class or record.hull_class) if retrofit else record.hull_class
+
+        return Ship(
+            record.name,
+            nickname,
+            record.gid,
+            self.wiki.page_url(record.name),
+            rarity,
+            retrofit,
+            hull_class,
+            find_skin_id(self.skin_data, record.gid, retrofit, record.name),
+        )
+
+    def resolve_equipment(self, records: list[EquipmentRecord], nickname: str) -> Equipment:
+        # Same choice as the wiki assembly: the highest tech level and stars
+        best = max(records, key=lambda r: (r.tech_level, r.stars))
+
+        image_ids = {r.image_id for r in records}
+        if len(image_ids) > 1:
+            raise ValueError(f'Multiple image IDs found for {best.name}: {image_ids}')
+
+        url = self.wiki.page_url(best.name)
+        # Like the wiki assembly, only link to a tech level when there is more than one
+        if len({r.tech_level for r in records}) > 1:
+            url += '#' + best.tech_level.url_fragment
+
+        return Equipment(
+            best.name,
+            nickname,
+            url,
+            max(r.stars for r in records),
+            best.tech_level,
+            best.image_id,
+        )
+
+    def resolve(self, name: str, nickname: str) -> ExternalData | None:
+        """
+        Returns the data for the ship or equipment called name, or None if the
+        wiki is needed to find out which it is.
+        """
+        if not self.can_resolve(name):
+            return None
+
+        if ship := self.ship_record(name):
+            return self.resolve_ship(ship, nickname)
+        else:
+            return self.resolve_equipment(self.equipment_records(name), nickname)
+
+
+_CROSS_CHECK_FIELDS = {
+    Ship: ('gid', 'url', 'rarity', 'retrofitted', 'hull_class', 'skin_id'),
+    Equipment: ('url', 'stars', 'tech_level', 'image_id'),
+}
+
+
+def cross_check(resolver: GameDataResolver, values: Iterable[ExternalData]) -> list[str]:
+    """
+    Compares records assembled from the wiki with the game data and describes
+    each difference.
+    """
+    problems = []
+
+    for data in values:
+        try:
+            offline = resolver.resolve(data.name, data.nickname)
+        except Exception as ex:
+            problems.append(f'{data.name}: unable to resolve from game data: {ex}')
+            continue
+
+        if offline is None:
+            problems.append(f'{data.name}: not found or ambiguous in game data')
+        elif type(offline) is not type(data):
+            problems.append(f'{data.name}: is {type(data).__name__} on the wiki but {type(offline).__name__} in game data')
+        else:
+            for field in _CROSS_CHECK_FIELDS[type(data)]:
+                wiki_value, game_value = getattr(data, field), getattr(offline, field)
+                if wiki_value != game_value:
+                    problems.append(f'{data.name}: {field} is {wiki_value!r} on the wiki but {game_value!r} in game data')
+
+    return problems
@@ -0,0 +1,140 @@
+"""
+Builds a time series of each ship's equipment ranks from dated guide exports.
+
+All exports are processed in one run that shares the wiki client, skin data
+and page cache, so each wiki page is loaded once no matter how many exports
+refer to it.
+
+The data file lists the guide dates and, for each ship, slot and equipment, a
+string with one character per date: the EquipmentRank.numeric value the
+equipment had in that guide, ``0`` if the ship did not list it in that slot,
+or ``-`` if the ship was not in that guide.
+"""
+
+import argparse
+from collections.abc import Iterable
+from collections.abc import Mapping
+from datetime import date
+from pathlib import Path
+import re
+
+from . import DATA_DIR
+from .external import get_shared_wiki_client
+from .external import load_skin_data
+from .extract import EXPORTS_DIR
+from .extract import EXPORT_GLOB
+from .extract import find_guide_tables
+from .extract import load_export
+from .extract import parse_equip_table
+from .extract import report_problems
+from .sitefiles import write_pvp_json_data
+from .types import ShipUsage
+from .util import MultikeyCache
+
+USAGE_HISTORY_PATH = DATA_DIR / 'ship_usage_history.json'
+
+NOT_LISTED = '0'
+NOT_IN_GUIDE = '-'
+
+
+def export_date(path: Path) -> date:
+    if not (match := re.search(r'(\d{4}-\d{2}-\d{2})\.html$', path.name)):
+        raise ValueError(f'No guide date in export name {path.name}')
+    return date.fromisoformat(match[1])
+
+
+def extract_exports(export_paths: Iterable[Path]) -> dict[date, list[ShipUsage]]:
+    """
+    Raises ValueError if an export has no date in its name or several exports
+    have the same date, like exports of different regions' guides.
+    """
+    paths_by_date = {}
+    for path in export_paths:
+        guide_date = export_date(path)
+        if guide_date in paths_by_date:
+            raise ValueError(f'Exports {paths_by_date[guide_date].name} and {path.name} have the same date {guide_date}')
+        paths_by_date[guide_date] = path
+
+    # Only connects if a page has to be loaded from the wiki
+    client = get_shared_wiki_client()
+    ship_skin_data = load_skin_data()
+    cache = MultikeyCache()
+
+    usages_by_date = {}
+    failures = []
+
+    for guide_date, path in sorted(paths_by_date.items()):
+        print('Extracting', path.name)
+
+        usages = []
+        for table_name, table_element in find_guide_tables(load_export(path)).items():
+            cur_uses, cur_fails = parse_equip_table(
+                client,
+                ship_skin_data,
+                cache,
+                table_element,
+                interactive=False,
+            )
+            usages.extend(cur_uses)
+            failures.extend((guide_date, table_name, *f) for f in cur_fails)
+
+        usages_by_date[guide_date] = usages
+
+    print()
+    report_problems(cache.allvalues, failures)
+
+    return usages_by_date
+
+
+def build_usage_history(usages_by_date: Mapping[date, list[ShipUsage]]) -> dict:
+    dates = sorted(usages_by_date)
+
+    # ship -> slot -> equipment -> one rank character per date
+    series: dict[str, dict[str, dict[str, list[str]]]] = {}
+    present: dict[str, list[bool]] = {}
+
+    for date_i, guide_date in enumerate(dates):
+        for usage in usages_by_date[guide_date]:
+            ship_series = series.setdefault(usage.ship.name, {})
+            present.setdefault(usage.ship.name, [False] * len(dates))[date_i] = True
+
+            for slot, equips in usage.slots.items():
+                slot_series = ship_series.setdefault(str(slot), {})
+                for ewr in equips:
+                    ranks = slot_series.setdefault(ewr.equip.name, [NOT_LISTED] * len(dates))
+                    ranks[date_i] = str(ewr.rank.numeric)
+
+    return {
+        'dates': [d.isoformat() for d in dates],
+        'ships': {
+            ship: {
+                slot: {
+                    equip: ''.join(
+                        rank if present[ship][date_i] else NOT_IN_GUIDE
+                        for date_i, rank in enumerate(ranks)
+                    )
+                    for equip, ranks in slot_series.items()
+                }
+                for slot, slot_series in series[ship].items()
+            }
+            for ship in sorted(series)
+        },
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument(
+        'exports',
+        nargs='*',
+        type=Path,
+        help=f'HTML exports of the guide. Defaults to all exports in {EXPORTS_DIR.name}.',
+    )
+    args = parser.parse_args()
+
+    usages_by_date = extract_exports(args.exports or EXPORTS_DIR.glob(EXPORT_GLOB))
+    write_pvp_json_data(USAGE_HISTORY_PATH, build_usage_history(usages_by_date))
+
+
+if '__main__' == __name__:
+    main()
@@ -0,0 +1,193 @@
+"""
+Loadout analysis across all ships in the guide using NumPy.
+
+Usages are turned into a matrix of ships by equipment by slot, where each
+entry is the weight of the rank the equipment has in that slot, or 0 if the
+ship does not use it there. All queries operate on every ship at once.
+"""
+
+from collections.abc import Iterable
+from dataclasses import dataclass
+from typing import Any
+
+import numpy as np
+
+from . import DATA_DIR
+from .sitefiles import load_site_data
+from .sitefiles import write_pvp_json_data
+from .types import EQUIPMENT_SLOT_ORDER
+from .types import EquipmentRank
+from .types import Ship
+from .types import ShipUsage
+
+LOADOUT_ANALYSIS_PATH = DATA_DIR / 'loadout_analysis.json'
+
+
+def rank_weight(rank: EquipmentRank) -> int:
+    # Lower numeric ranks are better, so invert them: OPTIMAL gets the highest weight
+    return len(EquipmentRank) + 1 - rank.numeric
+
+
+def _top_k(scores: np.ndarray, k: int) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Returns the column indices and values of the k highest scores in each row,
+    sorted from highest to lowest.
+    """
+    k = min(k, scores.shape[1])
+    if k <= 0:
+        empty = np.empty((scores.shape[0], 0))
+        return empty.astype(np.intp), empty
+
+    # argpartition avoids sorting whole rows when only k values are needed
+    top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    top_scores = np.take_along_axis(scores, top, axis=1)
+    order = np.argsort(-top_scores, axis=1, kind='stable')
+
+    return np.take_along_axis(top, order, axis=1), np.take_along_axis(top_scores, order, axis=1)
+
+
+@dataclass(frozen=True)
+class LoadoutMatrix:
+    ships: list[Ship]
+    equipment: list[str]
+    # Shape is (ships, equipment, slots), with slots in EQUIPMENT_SLOT_ORDER
+    weights: np.ndarray
+
+    @classmethod
+    def from_usages(cls, usages: Iterable[ShipUsage]) -> 'LoadoutMatrix':
+        usages = list(usages)
+        ships = [u.ship for u in usages]
+        equipment = sorted({
+            ewr.equip.name
+            for u in usages
+            for equips in u.slots.values()
+            for ewr in equips
+        })
+
+        equip_index = {name: i for i, name in enumerate(equipment)}
+        slot_index = {slot: i for i, slot in enumerate(EQUIPMENT_SLOT_ORDER)}
+
+        weights = np.zeros((len(ships), len(equipment), len(EQUIPMENT_SLOT_ORDER)), dtype=np.float32)
+        for ship_i, usage in enumerate(usages):
+            for slot, equips in usage.slots.items():
+                for ewr in equips:
+                    weights[ship_i, equip_index[ewr.equip.name], slot_index[slot]] = rank_weight(ewr.rank)
+
+        return cls(ships, equipment, weights)
+
+    @property
+    def features(self) -> np.ndarray:
+        """Weights flattened to one row per ship and one column per (equipment, slot)."""
+        return self.weights.reshape(len(self.ships), -1)
+
+    def feature_label(self, feature: int) -> tuple[str, int | str]:
+        equip_i, slot_i = divmod(int(feature), len(EQUIPMENT_SLOT_ORDER))
+        return self.equipment[equip_i], EQUIPMENT_SLOT_ORDER[slot_i]
+
+    def same_hull_mask(self) -> np.ndarray:
+        hulls = np.array([s.hull_class.code for s in self.ships])
+        return hulls[:, None] == hulls[None, :]
+
+    def cosine_similarity(self) -> np.ndarray:
+        features = self.features
+        norms = np.linalg.norm(features, axis=1, keepdims=True)
+        # Ships without equipment have no direction; leave their similarity at 0
+        unit = np.divide(features, norms, out=np.zeros_like(features), where=norms > 0)
+        return unit @ unit.T
+
+    def _neighbor_similarity(self, same_hull: bool) -> np.ndarray:
+        similarity = self.cosine_similarity()
+        np.fill_diagonal(similarity, -np.inf)
+        if same_hull:
+            similarity[~self.same_hull_mask()] = -np.inf
+        return similarity
+
+    def nearest_ships(self, k: int, same_hull: bool = False) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Returns the indices and similarities of the k most similar ships to each ship.
+
+        Entries past the number of available neighbors have a similarity of -inf.
+        """
+        return _top_k(self._neighbor_similarity(same_hull), k)
+
+    def recommend_equipment(
+        self,
+        k: int,
+        neighbors: int = 5,
+        same_hull: bool = True,
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Scores equipment for each ship from the loadouts of its most similar ships.
+
+        A score is the average rank weight the neighbors give the equipment in
+        that slot, weighted by similarity. Equipment the ship already lists in
+        a slot is not recommended for that slot. With same_hull, ships that are
+        the only one of their hull class use neighbors of any hull class.
+
+        Returns feature indices (see feature_label) and scores of the top k
+        recommendations per ship.
+        """
+        neighbor_i, neighbor_sim = self.nearest_ships(neighbors, same_hull)
+
+        if same_hull:
+            lonely = ~np.isfinite(neighbor_sim).any(axis=1)
+            if lonely.any():
+                any_i, any_sim = self.nearest_ships(neighbors)
+                neighbor_i[lonely] = any_i[lonely]
+                neighbor_sim[lonely] = any_sim[lonely]
+
+        # Scatter neighbor similarities into a full ships x ships matrix so
+        # all recommendations are one matrix product
+        neighbor_weights = np.zeros((len(self.ships), len(self.ships)), dtype=np.float32)
+        valid = np.isfinite(neighbor_sim) & (neighbor_sim > 0)
+        rows = np.broadcast_to(np.arange(len(self.ships))[:, None], neighbor_i.shape)
+        neighbor_weights[rows[valid], neighbor_i[valid]] = neighbor_sim[valid]
+
+        totals = neighbor_weights.sum(axis=1, keepdims=True)
+        neighbor_weights = np.divide(
+            neighbor_weights, totals, out=np.zeros_like(neighbor_weights), where=totals > 0
+        )
+
+        features = self.features
+        scores = neighbor_weights @ features
+        scores[features > 0] = 0
+
+        return _top_k(scores, k)
+
+
+def analyze_loadouts(matrix: LoadoutMatrix, top: int) -> dict[str, dict[str, Any]]:
+    similar_i, similar_scores = matrix.nearest_ships(top)
+    recommend_i, recommend_scores = matrix.recommend_equipment(top)
+
+    analysis = {}
+    for ship_i, ship in enumerate(matrix.ships):
+        recommended = []
+        for feature, score in zip(recommend_i[ship_i], recommend_scores[ship_i]):
+            if score <= 0:
+                continue
+            name, slot = matrix.feature_label(feature)
+            recommended.append({'name': name, 'slot': str(slot), 'score': round(float(score), 4)})
+
+        analysis[ship.name] = {
+            'similar': [
+                {'ship': matrix.ships[other_i].name, 'similarity': round(float(score), 4)}
+                for other_i, score in zip(similar_i[ship_i], similar_scores[ship_i])
+                if np.isfinite(score)
+            ],
+            'recommended': recommended,
+        }
+
+    return analysis
+
+
+def write_loadout_analysis(usages: Iterable[ShipUsage], top: int = 5):
+    matrix = LoadoutMatrix.from_usages(usages)
+    write_pvp_json_data(LOADOUT_ANALYSIS_PATH, analyze_loadouts(matrix, top))
+
+
+def main():
+    write_loadout_analysis(load_site_data().usages)
+
+
+if '__main__' == __name__:
+    main()
@@ -0,0 +1,213 @@
+"""
+Memory and CPU profiling for extraction runs.
+
+Memory is traced with tracemalloc. The peak and remaining memory of each phase
+are recorded along with the allocation sites that grew the most during it.
+
+Stacks are sampled by a background thread that records the profiled thread's
+stack at a fixed interval. Only stacks inside the sampled functions are kept,
+starting from the outermost one, and are written in the collapsed format read
+by flamegraph.pl, speedscope and similar tools. Two reports are written:
+
+- cpu.collapsed weighs each sample by the CPU time the thread used since the
+  previous sample, in microseconds, so waiting on the wiki counts for nothing.
+  Per-thread CPU clocks are only available on Unix, so it is skipped elsewhere.
+- wall.collapsed counts samples, so it includes waiting on the wiki.
+
+Tracing memory slows the run down considerably, so timings from a profiled run
+are only useful relative to each other.
+"""
+
+from collections import Counter
+from collections.abc import Callable
+from collections.abc import Iterable
+from contextlib import contextmanager
+from dataclasses import dataclass
+from pathlib import Path
+import sys
+import threading
+import time
+import tracemalloc
+
+SAMPLE_INTERVAL = 0.005
+TOP_SITES = 10
+
+# Allocations made by the profiler itself
+_IGNORED_TRACES = [
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, __file__),
+    tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+    tracemalloc.Filter(False, '<unknown>'),
+]
+
+
+@dataclass(frozen=True)
+class PhaseStats:
+    name: str
+    seconds: float
+    peak_bytes: int
+    end_bytes: int
+    top_sites: list[tracemalloc.StatisticDiff]
+
+
+def _frame_label(code) -> str:
+    return f'{Path(code.co_filename).stem}.{code.co_qualname}'
+
+
+def _thread_cpu_clock(thread_id: int) -> int | None:
+    try:
+        return time.pthread_getcpuclockid(thread_id)
+    except AttributeError:
+        # Not available on Windows
+        return None
+
+
+class StackSampler:
+    """
+    Counts the stacks of one thread that pass through any of the sampled
+    functions, and the CPU time the thread used in each.
+    """
+    stacks: Counter[str]
+    # Microseconds, or None if the thread's CPU time cannot be read
+    cpu_stacks: Counter[str] | None
+
+    def __init__(self, thread_id: int, functions: Iterable[Callable], interval: float = SAMPLE_INTERVAL):
+        self.thread_id = thread_id
+        self.interval = interval
+        self._codes = frozenset(f.__code__ for f in functions)
+        self._cpu_clock = _thread_cpu_clock(thread_id)
+        self.stacks = Counter()
+        self.cpu_stacks = None if self._cpu_clock is None else Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='stack-sampler', daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _cpu_ns(self) -> int:
+        return time.clock_gettime_ns(self._cpu_clock) if self._cpu_clock is not None else 0
+
+    def _run(self):
+        last_cpu_ns = self._cpu_ns()
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            # CPU time since the last sample is charged to the current stack
+            cpu_ns = self._cpu_ns()
+            cpu_us = (cpu_ns - last_cpu_ns) // 1000
+            last_cpu_ns = cpu_ns
+
+            stack = []
+            sampled_depth = 0
+            while frame is not None:
+                stack.append(frame.f_code)
+                if frame.f_code in self._codes:
+                    # Keep going to find the outermost sampled function
+                    sampled_depth = len(stack)
+                frame = frame.f_back
+
+            if sampled_depth:
+                # Collapsed stacks list the outermost frame first
+                collapsed = ';'.join(_frame_label(c) for c in reversed(stack[:sampled_depth]))
+                self.stacks[collapsed] += 1
+                if self.cpu_stacks is not None and cpu_us:
+                    self.cpu_stacks[collapsed] += cpu_us
+
+
+class ExtractionProfiler:
+    """
+    Profiles the phases of a run when given an output directory, and does
+    nothing otherwise, so the run's code is the same either way.
+    """
+    phases: list[PhaseStats]
+
+    def __init__(self, output_dir: Path | None, sampled_functions: Iterable[Callable] = ()):
+        self.output_dir = output_dir
+        self.sampled_functions = list(sampled_functions)
+        self.phases = []
+        self._sampler = None
+        self._snapshot = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.output_dir is not None
+
+    def __enter__(self):
+        if self.enabled:
+            tracemalloc.start()
+            self._snapshot = tracemalloc.take_snapshot().filter_traces(_IGNORED_TRACES)
+            self._sampler = StackSampler(threading.get_ident(), self.sampled_functions)
+            self._sampler.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        if self.enabled:
+            self._sampler.stop()
+            tracemalloc.stop()
+            self.write_report()
+
+    @contextmanager
+    def phase(self, name: str):
+        if not self.enabled:
+            yield
+            return
+
+        tracemalloc.reset_peak()
+        start = time.perf_counter()
+        yield
+        seconds = time.perf_counter() - start
+
+        end_bytes, peak_bytes = tracemalloc.get_traced_memory()
+        snapshot = tracemalloc.take_snapshot().filter_traces(_IGNORED_TRACES)
+        top_sites = snapshot.compare_to(self._snapshot, 'lineno')[:TOP_SITES]
+        self._snapshot = snapshot
+
+        self.phases.append(PhaseStats(name, seconds, peak_bytes, end_bytes, top_sites))
+
+    def render_memory_report(self) -> str:
+        name_width = max([len('Phase'), *(len(p.name) for p in self.phases)])
+        lines = [f'{"Phase":<{name_width}}  {"Peak MiB":>9}  {"End MiB":>9}  {"Seconds":>8}']
+        for p in self.phases:
+            lines.append(f'{p.name:<{name_width}}  {p.peak_bytes / 2**20:9.1f}  {p.end_bytes / 2**20:9.1f}  {p.seconds:8.2f}')
+
+        for p in self.phases:
+            lines.append('')
+            lines.append(f'Top allocation sites: {p.name}')
+            for site in p.top_sites:
+                frame = site.traceback[0]
+                lines.append(f'{site.size_diff / 2**20:+9.2f} MiB  {site.size / 2**20:9.2f} MiB  {frame.filename}:{frame.lineno}')
+
+        return '\n'.join(lines) + '\n'
+
+    def write_report(self):
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+
+        memory_report = self.render_memory_report()
+        memory_path = self.output_dir / 'memory.txt'
+        memory_path.write_text(memory_report, encoding='utf-8')
+
+        wall_path = self.output_dir / 'wall.collapsed'
+        _write_collapsed(wall_path, self._sampler.stacks)
+
+        print()
+        print(memory_report)
+        print('Wrote', memory_path)
+
+        cpu_path = self.output_dir / 'cpu.collapsed'
+        if (cpu_stacks := self._sampler.cpu_stacks) is not None:
+            _write_collapsed(cpu_path, cpu_stacks)
+            print('Wrote', cpu_path, f'({cpu_stacks.total() / 1e6:.2f} CPU seconds)')
+        else:
+            print('Thread CPU time is not available on this platform. Skipping', cpu_path.name)
+
+        print('Wrote', wall_path, f'({self._sampler.stacks.total()} samples every {self._sampler.interval * 1000:g} ms, including waits)')
+
+
+def _write_collapsed(path: Path, stacks: Counter[str]):
+    path.write_text(
+        ''.join(f'{stack} {count}\n' for stack, count in sorted(stacks.items())),
+        encoding='utf-8',
+    )
@@ -0,0 +1,135 @@
+"""
+Extracts the guides for several server regions concurrently.
+
+Each region parses its own export in its own thread. Regions on the same wiki
+share one client, so together they stay within its rate limit. All regions
+share one page cache, and ships and equipment are identified by gid and image
+ID, so a page linked from several guides is loaded once and every region
+refers to the same record.
+
+Ship and equipment data from all regions is written to the shared data files.
+Usage data is written to one file per region.
+"""
+
+import argparse
+from collections.abc import Callable
+from collections.abc import Iterable
+from collections.abc import Sequence
+from concurrent.futures import ThreadPoolExecutor
+import threading
+
+from .external import DEFAULT_REGION
+from .external import ExternalData
+from .external import REGIONS
+from .external import Region
+from .external import get_shared_wiki_client
+from .external import identity_key
+from .external import load_skin_data
+from .extract import EXPORTS_DIR
+from .extract import find_guide_tables
+from .extract import find_latest_export
+from .extract import load_export
+from .extract import parse_equip_table
+from .extract import report_problems
+from .extract import write_reference_data
+from .extract import write_usage_data
+from .types import ShipUsage
+from .util import ConcurrentMultikeyCache
+
+
+class SharedPageCache:
+    """
+    Page cache shared by all regions that also merges pages describing the
+    same ship or equipment into one record.
+    """
+    _by_identity: dict[tuple[type, int], ExternalData]
+
+    def __init__(self):
+        self.pages = ConcurrentMultikeyCache[str, ExternalData]()
+        self._by_identity = {}
+        self._identity_lock = threading.Lock()
+
+    def canonical(self, data: ExternalData) -> ExternalData:
+        with self._identity_lock:
+            return self._by_identity.setdefault(identity_key(data), data)
+
+    def get(
+        self,
+        equivalent_keys: Iterable[str],
+        fetch: Callable[[], ExternalData],
+    ) -> tuple[ExternalData, bool]:
+        return self.pages.get(equivalent_keys, lambda: self.canonical(fetch()))
+
+    @property
+    def allvalues(self) -> set[ExternalData]:
+        with self._identity_lock:
+            return set(self._by_identity.values())
+
+
+def extract_region(region: Region, ship_skin_data, cache: SharedPageCache) -> tuple[list[ShipUsage], list]:
+    export_path = find_latest_export(EXPORTS_DIR, region.export_glob)
+    print(region.code, 'extracting', export_path.name)
+
+    # Regions on the same wiki share its client and rate limit
+    client = get_shared_wiki_client(region)
+
+    usages = []
+    failures = []
+    for table_name, table_element in find_guide_tables(load_export(export_path)).items():
+        cur_uses, cur_fails = parse_equip_table(
+            client,
+            ship_skin_data,
+            cache,
+            table_element,
+            interactive=False,
+        )
+        usages.extend(cur_uses)
+        failures.extend((region.code, table_name, *f) for f in cur_fails)
+
+    return usages, failures
+
+
+def extract_regions(regions: Sequence[Region]):
+    ship_skin_data = load_skin_data()
+    cache = SharedPageCache()
+
+    with ThreadPoolExecutor(max_workers=len(regions), thread_name_prefix='region') as executor:
+        futures = {
+            region: executor.submit(extract_region, region, ship_skin_data, cache)
+            for region in regions
+        }
+        results = {region: future.result() for region, future in futures.items()}
+
+    print()
+    report_problems(cache.allvalues, [f for usages, failures in results.values() for f in failures])
+
+    print()
+    data_by_types = write_reference_data(cache.allvalues)
+    for region, (usages, failures) in results.items():
+        write_usage_data(data_by_types, usages, region)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument(
+        '--region',
+        dest='regions',
+        action='append',
+        choices=list(REGIONS),
+        help='Region to extract. Repeat for several regions. Defaults to all regions with an export.',
+    )
+    args = parser.parse_args()
+
+    if args.regions:
+        regions = [REGIONS[code] for code in args.regions]
+    else:
+        regions = [r for r in REGIONS.values() if any(EXPORTS_DIR.glob(r.export_glob))]
+        if not regions:
+            # Let the default region report the missing export
+            regions = [DEFAULT_REGION]
+
+    extract_regions(regions)
+
+
+if '__main__' == __name__:
+    main()
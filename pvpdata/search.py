@@ -0,0 +1,156 @@
+"""
+Builds a precomputed search index over the site's ships for the browser.
+
+The index is an inverted index from search terms and facet values to posting
+lists of ship IDs. Ship IDs are positions in the manifest's ship list, and
+posting lists are sorted so the browser can intersect them with a merge.
+
+The index is split into small files so the browser only fetches what a query
+needs:
+
+* ``manifest.json``: the ship list and the names of all other files.
+* ``terms-<key>.json``: name/nickname tokens and token prefixes whose first
+  character is ``<key>``.
+* ``facet-<name>.json``: one file per facet (hull class, rarity, equipment).
+"""
+
+from collections import defaultdict
+from collections.abc import Iterable
+import re
+import unicodedata
+
+from . import SITE_SOURCE
+from .sitefiles import SiteData
+from .sitefiles import load_site_data
+from .sitefiles import write_pvp_json_data
+from .types import EquipmentRank
+from .types import HullClass
+from .types import Ship
+from .types import ShipRarity
+
+SEARCH_INDEX_DIR = SITE_SOURCE / 'assets' / 'search'
+
+# Bump whenever the file layout changes so cached copies in browsers can be ignored
+SEARCH_INDEX_VERSION = 1
+
+# Shard key for terms starting with anything other than a-z or 0-9
+OTHER_SHARD = '_'
+
+ANY_RANK = 'any'
+
+
+def normalize_text(text: str) -> str:
+    # Strip accents so "Agir" finds "Ägir"
+    decomposed = unicodedata.normalize('NFKD', text.casefold())
+    return ''.join(c for c in decomposed if not unicodedata.combining(c))
+
+
+def tokenize(text: str) -> list[str]:
+    return re.findall(r'\w+', normalize_text(text))
+
+
+def shard_key(term: str) -> str:
+    first = term[0]
+    return first if first.isascii() and first.isalnum() else OTHER_SHARD
+
+
+def _add_posting(index: dict[str, list[int]], key: str, ship_id: int):
+    postings = index[key]
+    # Ship IDs are added in increasing order, so only the last entry can be a duplicate
+    if not postings or postings[-1] != ship_id:
+        postings.append(ship_id)
+
+
+def build_search_index(site_data: SiteData) -> dict[str, dict]:
+    """
+    Builds all index files in one pass over the ships and usages.
+
+    Returns a mapping of file name to file content.
+    """
+    ships: list[Ship] = sorted(site_data.ships.values(), key=lambda s: s.name)
+    ship_ids = {s.name: i for i, s in enumerate(ships)}
+
+    tokens: dict[str, list[int]] = defaultdict(list)
+    prefixes: dict[str, list[int]] = defaultdict(list)
+    hull_classes: dict[str, list[int]] = defaultdict(list)
+    rarities: dict[str, list[int]] = defaultdict(list)
+
+    for ship_id, ship in enumerate(ships):
+        for token in sorted(set(tokenize(ship.name) + tokenize(ship.nickname))):
+            _add_posting(tokens, token, ship_id)
+            for end in range(1, len(token) + 1):
+                _add_posting(prefixes, token[:end], ship_id)
+
+        _add_posting(hull_classes, ship.hull_class.code, ship_id)
+        _add_posting(rarities, ship.rarity.code, ship_id)
+
+    # Equipment posting lists are filled in usage order, so collect sets and sort after
+    equipment_ships: dict[str, dict[str, set[int]]] = defaultdict(lambda: defaultdict(set))
+    for usage in site_data.usages:
+        ship_id = ship_ids[usage.ship.name]
+        for equips in usage.slots.values():
+            for ewr in equips:
+                by_rank = equipment_ships[ewr.equip.name]
+                by_rank[ANY_RANK].add(ship_id)
+                by_rank[ewr.rank.name].add(ship_id)
+
+    files = {}
+
+    shards: dict[str, dict[str, dict[str, list[int]]]] = defaultdict(
+        lambda: {'tokens': {}, 'prefixes': {}}
+    )
+    for kind, terms in (('tokens', tokens), ('prefixes', prefixes)):
+        for term in sorted(terms):
+            shards[shard_key(term)][kind][term] = terms[term]
+
+    for key in sorted(shards):
+        files[f'terms-{key}.json'] = shards[key]
+
+    # Enum order keeps facet values in the order users expect instead of alphabetical
+    files['facet-hull_class.json'] = {
+        hc.code: hull_classes[hc.code] for hc in HullClass if hc.code in hull_classes
+    }
+    files['facet-rarity.json'] = {
+        r.code: rarities[r.code] for r in ShipRarity if r.code in rarities
+    }
+    files['facet-equipment.json'] = {
+        name: {
+            rank: sorted(by_rank[rank])
+            for rank in (ANY_RANK, *(r.name for r in EquipmentRank))
+            if rank in by_rank
+        }
+        for name, by_rank in sorted(equipment_ships.items())
+    }
+
+    manifest = {
+        'version': SEARCH_INDEX_VERSION,
+        'ships': [[s.name, s.nickname, s.hull_class.code, s.rarity.code] for s in ships],
+        'term_shards': sorted(shards),
+        'other_shard': OTHER_SHARD,
+        'facets': ['hull_class', 'rarity', 'equipment'],
+    }
+
+    return {'manifest.json': manifest, **files}
+
+
+def write_search_index(files: Iterable[tuple[str, dict]]):
+    SEARCH_INDEX_DIR.mkdir(parents=True, exist_ok=True)
+
+    written = set()
+    for name, content in files:
+        write_pvp_json_data(SEARCH_INDEX_DIR / name, content, minify=True)
+        written.add(name)
+
+    # Remove shards that no longer have any terms
+    for stale in SEARCH_INDEX_DIR.glob('*.json'):
+        if stale.name not in written:
+            stale.unlink()
+            print('Removed', stale)
+
+
+def main():
+    write_search_index(build_search_index(load_site_data()).items())
+
+
+if '__main__' == __name__:
+    main()
@@ -0,0 +1,246 @@
+"""
+Runs a local extraction service that keeps the wiki client, skin data and page
+cache loaded between requests, so editors and scripts don't wait for a cold
+start each time.
+
+Requests and responses are JSON:
+
+    POST /exports          Extract an export, {"path": ...} or the newest export
+    GET  /pages?url=...    Ship or equipment data for a wiki page, loading it if needed
+    GET  /cache            Names of the cached ships and equipment
+    GET  /cache?key=...    Cached data for a page name, without loading it
+    GET  /data/<file>      A generated data file
+
+Pages requested by several callers at once are only loaded once. Wiki
+requests are sent one at a time to respect the rate limit. Pages loaded for
+/pages are kept apart from the pages extraction uses, so queries never change
+the data files.
+"""
+
+import argparse
+from collections.abc import Callable
+from collections.abc import Iterable
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler
+from http.server import ThreadingHTTPServer
+import json
+from pathlib import Path
+import threading
+from urllib.parse import parse_qs
+from urllib.parse import unquote as urlunquote
+from urllib.parse import urlparse
+
+from . import DATA_DIR
+from .external import ExternalData
+from .external import get_shared_wiki_client
+from .extract import EXPORTS_DIR
+from .extract import extract_page_name
+from .extract import find_latest_export
+from .extract import load_page_data
+from .gamefiles import GameDataResolver
+from .sitefiles import DATA_FILE_BASENAMES
+from .sitefiles import encode_pvp_json
+from .types import Equipment
+from .types import Ship
+from .util import ConcurrentMultikeyCache
+from .watch import IncrementalExtractor
+
+DEFAULT_PORT = 8765
+
+
+class RequestError(Exception):
+    def __init__(self, status: HTTPStatus, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+class _QueryCache:
+    """
+    Finds pages in the extraction cache, but keeps pages loaded for queries in
+    a cache of its own. Records are created with the nickname they were first
+    requested with, so a query must not create the record extraction uses.
+    """
+
+    def __init__(self, extraction_cache: ConcurrentMultikeyCache[str, ExternalData]):
+        self._extraction_cache = extraction_cache
+        self._cache = ConcurrentMultikeyCache[str, ExternalData]()
+
+    def get(
+        self,
+        equivalent_keys: Iterable[str],
+        fetch: Callable[[], ExternalData],
+    ) -> tuple[ExternalData, bool]:
+        keys = []
+        for k in equivalent_keys:
+            if (value := self._extraction_cache.peek(k) or self._cache.peek(k)) is not None:
+                return value, True
+            keys.append(k)
+
+        return self._cache.get(keys, fetch)
+
+
+class ExtractionService:
+    def __init__(self, resolver: GameDataResolver | None = None):
+        self.cache = ConcurrentMultikeyCache()
+        self.extractor = IncrementalExtractor(get_shared_wiki_client(), self.cache, resolver)
+        self._query_cache = _QueryCache(self.cache)
+        # Extraction writes the data files, so only one runs at a time
+        self._extract_lock = threading.Lock()
+
+    def extract(self, export_path: Path | None = None) -> dict:
+        with self._extract_lock:
+            export_path = export_path or find_latest_export(EXPORTS_DIR)
+            changed = self.extractor.extract(export_path)
+
+            return {
+                'export': export_path.name,
+                'changed': changed,
+                'usages': len(self.extractor.usages),
+                'failures': [
+                    f'{table_name} {loc}: {ex}'
+                    for table_name, loc, cell, usage, ex in self.extractor.failures
+                ],
+            }
+
+    def resolve_page(self, url: str, nickname: str | None = None) -> dict:
+        parsed_url = urlparse(url)
+        if not extract_page_name(parsed_url):
+            raise RequestError(HTTPStatus.BAD_REQUEST, f'No page name in {url}')
+
+        page_data, cached = load_page_data(
+            self.extractor.client,
+            self.extractor.ship_skin_data,
+            self._query_cache,
+            parsed_url,
+            nickname or extract_page_name(parsed_url).replace('_', ' '),
+            self.extractor.resolver,
+        )
+        return {
+            'type': DATA_FILE_BASENAMES[type(page_data)],
+            'cached': cached,
+            'data': page_data,
+        }
+
+    def cached_page(self, key: str) -> dict:
+        if not (page_data := self.cache.peek(key)):
+            raise RequestError(HTTPStatus.NOT_FOUND, f'{key} is not cached')
+
+        return {'type': DATA_FILE_BASENAMES[type(page_data)], 'data': page_data}
+
+    def cache_summary(self) -> dict:
+        values = self.cache.allvalues
+        return {
+            DATA_FILE_BASENAMES[t]: sorted(v.name for v in values if isinstance(v, t))
+            for t in (Ship, Equipment)
+        }
+
+    def data_file(self, name: str) -> bytes:
+        path = DATA_DIR / name
+        # Only files directly in the data directory
+        if path.parent != DATA_DIR or path.suffix != '.json' or not path.is_file():
+            raise RequestError(HTTPStatus.NOT_FOUND, f'No data file {name}')
+
+        return path.read_bytes()
+
+
+class ServiceRequestHandler(BaseHTTPRequestHandler):
+    server: 'ExtractionServer'
+
+    def _send(self, status: HTTPStatus, body: bytes):
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _handle(self, route):
+        try:
+            result = route()
+        except RequestError as ex:
+            status, result = ex.status, {'error': str(ex)}
+        except Exception as ex:
+            status, result = HTTPStatus.INTERNAL_SERVER_ERROR, {'error': f'{type(ex).__name__}: {ex}'}
+        else:
+            status = HTTPStatus.OK
+
+        body = result if isinstance(result, bytes) else encode_pvp_json(result, minify=True).encode('utf-8')
+        self._send(status, body)
+
+    def do_GET(self):
+        self._handle(self._route_get)
+
+    def do_POST(self):
+        self._handle(self._route_post)
+
+    def _route_get(self):
+        url = urlparse(self.path)
+        query = {k: v[-1] for k, v in parse_qs(url.query).items()}
+        service = self.server.service
+
+        if url.path == '/pages':
+            if 'url' not in query:
+                raise RequestError(HTTPStatus.BAD_REQUEST, 'Missing url parameter')
+            return service.resolve_page(query['url'], query.get('nickname'))
+
+        if url.path == '/cache':
+            if 'key' in query:
+                return service.cached_page(query['key'])
+            return service.cache_summary()
+
+        if url.path.startswith('/data/'):
+            return service.data_file(urlunquote(url.path.removeprefix('/data/')))
+
+        raise RequestError(HTTPStatus.NOT_FOUND, f'Unknown path {url.path}')
+
+    def _route_post(self):
+        url = urlparse(self.path)
+        if url.path != '/exports':
+            raise RequestError(HTTPStatus.NOT_FOUND, f'Unknown path {url.path}')
+
+        length = int(self.headers.get('Content-Length') or 0)
+        try:
+            body = json.loads(self.rfile.read(length) or '{}')
+        except json.JSONDecodeError as ex:
+            raise RequestError(HTTPStatus.BAD_REQUEST, f'Invalid JSON: {ex}') from None
+
+        export_path = body.get('path') if isinstance(body, dict) else None
+        if export_path and not Path(export_path).is_file():
+            raise RequestError(HTTPStatus.BAD_REQUEST, f'{export_path} is not a file')
+
+        return self.server.service.extract(Path(export_path) if export_path else None)
+
+
+class ExtractionServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address: tuple[str, int], service: ExtractionService):
+        super().__init__(address, ServiceRequestHandler)
+        self.service = service
+
+
+def serve(port: int = DEFAULT_PORT, offline: bool = False):
+    service = ExtractionService(GameDataResolver.load() if offline else None)
+
+    with ExtractionServer(('127.0.0.1', port), service) as server:
+        print(f'Serving on http://127.0.0.1:{port} (Ctrl+C to stop)')
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            print('Stopped serving')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT, help='Local port to listen on')
+    parser.add_argument(
+        '--offline',
+        action='store_true',
+        help='Resolve ship and equipment metadata from the gamefiles data, using the wiki only when needed.',
+    )
+    args = parser.parse_args()
+
+    serve(args.port, args.offline)
+
+
+if '__main__' == __name__:
+    main()
@@ -2,19 +2,36 @@
 Functions and information for working with the site's data files.
 """
 
+from collections.abc import Callable
 from collections.abc import Mapping
 import dataclasses
+from dataclasses import dataclass
 from enum import Enum
+import gzip
 import json
+import os
 from pathlib import Path
 from types import MappingProxyType
 from typing import Any
+from typing import TYPE_CHECKING
 
 from . import DATA_DIR
+from . import SITE_SOURCE
 from .types import EquipWithRank
 from .types import Equipment
+from .types import EquipmentRank
+from .types import HullClass
 from .types import Ship
+from .types import ShipRarity
 from .types import ShipUsage
+from .types import TechLevel
+from .util import lazy_import
+
+if TYPE_CHECKING:
+    import brotli
+else:
+    # Only loaded when deploy copies are written
+    brotli = lazy_import('brotli')
 
 
 DATA_FILE_BASENAMES : Mapping[type, str] = MappingProxyType({
@@ -24,34 +41,167 @@ DATA_FILE_BASENAMES : Mapping[type, str] = MappingProxyType({
 })
 
 
-def get_data_path(datatype: type):
+def get_data_path(datatype: type, data_dir: Path = DATA_DIR, suffix: str = ''):
     basename = DATA_FILE_BASENAMES[datatype]
-    return DATA_DIR / f'{basename}.json'
+    return data_dir / f'{basename}{suffix}.json'
+
+
+# Converts each data type to the object written for it, with keys in output
+# order. Dataclasses without an entry are added the first time they are seen.
+_CONVERTERS: dict[type, Callable[[Any], dict[str, Any]]] = {
+    # Usages and ranked equipment refer to ships and equipment by name
+    ShipUsage: lambda u: {
+        'ship': u.ship.name,
+        'description': u.description,
+        'description_html': u.description_html,
+        'equipment': u.slots,
+    },
+    EquipWithRank: lambda e: {'name': e.equip.name, 'rank': e.rank.name},
+}
+
+
+def _dataclass_converter(datatype: type) -> Callable[[Any], dict[str, Any]]:
+    names = tuple(f.name for f in dataclasses.fields(datatype))
+    return lambda o: {name: getattr(o, name) for name in names}
 
 
 def to_json_serializable(o):
-    # TODO: Simplify these data types to use the names instead of
-    # full objects
-    if isinstance(o, EquipWithRank):
-        return {'name': o.equip.name, 'rank': str(o.rank)}
+    # Data types are converted one level at a time. The json module converts
+    # nested values as it reaches them, so nothing is deep copied like
+    # dataclasses.asdict would.
+    convert = _CONVERTERS.get(type(o))
+
+    if convert is None:
+        if isinstance(o, Enum):
+            return o.name
+
+        if isinstance(o, Mapping):
+            return dict(o)
+
+        if not dataclasses.is_dataclass(o):
+            raise TypeError(f'Cannot serialize {o} {type(o).__name__})')
+
+        convert = _CONVERTERS[type(o)] = _dataclass_converter(type(o))
+
+    return convert(o)
+
+
+#region Writing data files
+
+# Minified and precompressed copies of the data files for browsers to fetch
+DEPLOY_DATA_DIR = SITE_SOURCE / 'assets' / 'data'
+
+
+def encode_pvp_json(data: Any, minify: bool = False) -> str:
+    # Minified output is meant for files the browser fetches directly.
+    # Files in the repository stay indented to keep diffs readable.
+    format_args = {'separators': (',', ':')} if minify else {'indent': 4}
+    return json.dumps(data, default=to_json_serializable, **format_args)
+
+
+def _write_file(path: Path, content: bytes):
+    # Leave unchanged files alone so file watchers like jekyll serve don't rebuild
+    if path.is_file() and path.read_bytes() == content:
+        print('Unchanged', path)
+        return
+
+    # Replace the file in one step so readers never see a partially written file
+    temp_path = path.with_name(path.name + '.tmp')
+    temp_path.write_bytes(content)
+    os.replace(temp_path, path)
+    print('Wrote', path)
+
+
+def write_pvp_json_data(path: Path, data: Any, minify: bool = False):
+    _write_file(path, encode_pvp_json(data, minify).encode('utf-8'))
+
+
+def write_deploy_json_data(path: Path, data: Any):
+    """
+    Writes data minified to path, along with gzip and brotli compressed copies
+    for servers that serve precompressed files.
+    """
+    content = encode_pvp_json(data, minify=True).encode('utf-8')
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    _write_file(path, content)
+    # No timestamp so unchanged data compresses to unchanged files
+    _write_file(path.with_name(path.name + '.gz'), gzip.compress(content, compresslevel=9, mtime=0))
+    _write_file(path.with_name(path.name + '.br'), brotli.compress(content, quality=11))
+
+#endregion
+
+
+#region Reading data files
+
+def read_pvp_json_data(path: Path) -> Any:
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def parse_slot_key(key: str) -> int | str:
+    # JSON object keys are always strings, but numbered slots are ints in ShipUsage
+    return int(key) if key.isdigit() else key
+
+
+def ship_from_json(data: Mapping[str, Any]) -> Ship:
+    return Ship(**{
+        **data,
+        'rarity': ShipRarity[data['rarity']],
+        'hull_class': HullClass[data['hull_class']],
+    })
+
+
+def equipment_from_json(data: Mapping[str, Any]) -> Equipment:
+    return Equipment(**{
+        **data,
+        'tech_level': TechLevel[data['tech_level']],
+    })
+
+
+def ship_usage_from_json(
+    data: Mapping[str, Any],
+    ships: Mapping[str, Ship],
+    equipment: Mapping[str, Equipment],
+) -> ShipUsage:
+    usage = ShipUsage(ships[data['ship']], data['description'], description_html=data.get('description_html'))
+
+    for slot, equips in data['equipment'].items():
+        usage.slots[parse_slot_key(slot)].extend(
+            EquipWithRank.shared(equipment[e['name']], EquipmentRank[e['rank']])
+            for e in equips
+        )
+
+    return usage
+
 
-    if isinstance(o, ShipUsage):
-        return {
-            'ship': o.ship.name,
-            'description': o.description,
-            'equipment': o.slots,
-        }
+@dataclass(frozen=True)
+class SiteData:
+    ships: dict[str, Ship]
+    equipment: dict[str, Equipment]
+    usages: list[ShipUsage]
 
-    if dataclasses.is_dataclass(o):
-        return dataclasses.asdict(o)
 
-    if isinstance(o, Enum):
-        return o.name
+def load_site_data(data_dir: Path = DATA_DIR) -> SiteData:
+    """
+    Loads the site's data files back into data types.
 
-    raise TypeError(f'Cannot serialize {o} {type(o).__name__})')
+    Raises KeyError if a usage refers to a ship or equipment missing from its
+    data file.
+    """
+    ships = {
+        name: ship_from_json(d)
+        for name, d in read_pvp_json_data(get_data_path(Ship, data_dir)).items()
+    }
+    equipment = {
+        name: equipment_from_json(d)
+        for name, d in read_pvp_json_data(get_data_path(Equipment, data_dir)).items()
+    }
+    usages = [
+        ship_usage_from_json(d, ships, equipment)
+        for d in read_pvp_json_data(get_data_path(ShipUsage, data_dir))
+    ]
 
+    return SiteData(ships, equipment, usages)
 
-def write_pvp_json_data(path: Path, data: Any):
-    with open(path, 'w', encoding='utf-8', newline='') as f:
-        json.dump(data, f, indent=4, default=to_json_serializable)
-        print('Wrote', f.name)
+#endregion
@@ -2,12 +2,24 @@
 Data types for data represented in the site's files.
 """
 
-from collections import defaultdict
+from collections.abc import Iterable
+from collections.abc import Iterator
+from collections.abc import Mapping
+from collections.abc import MutableMapping
 from dataclasses import dataclass
 from dataclasses import field
 import enum
 from enum import Enum
 from functools import total_ordering
+import sys
+from typing import ClassVar
+
+
+def _intern_fields(obj, *names: str):
+    # Names and URLs repeat across cache keys, records and loaded files.
+    # Interning keeps one copy of each in memory.
+    for name in names:
+        object.__setattr__(obj, name, sys.intern(getattr(obj, name)))
 
 
 class RarityColor(Enum):
@@ -104,7 +116,7 @@ class HullClass(Enum):
         return f'<{type(self).__name__}: {self.code}>'
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class Ship:
     name: str
     nickname: str
@@ -115,6 +127,9 @@ class Ship:
     hull_class: HullClass
     skin_id: int
 
+    def __post_init__(self):
+        _intern_fields(self, 'name', 'nickname', 'url')
+
 
 class EquipmentRarity(Enum):
     N  = ('Normal', RarityColor.GRAY)
@@ -178,7 +193,7 @@ class TechLevel(Enum):
         return f'<{type(self).__name__}:{self}>'
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class Equipment:
     name: str
     nickname: str
@@ -188,6 +203,9 @@ class Equipment:
     image_id: int
     # equip_type: str
 
+    def __post_init__(self):
+        _intern_fields(self, 'name', 'nickname', 'url')
+
     @property
     def rarity(self) -> EquipmentRarity:
         return EQUIP_RARITY_BY_STARS[self.stars]
@@ -216,22 +234,123 @@ class EquipmentRank(Enum):
 
 EQUIP_RANK_BY_COLOR = {r.bgcolor: r for r in EquipmentRank}
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class EquipWithRank:
     equip: Equipment
     rank: EquipmentRank
 
+    _shared: ClassVar[dict[tuple[Equipment, EquipmentRank], 'EquipWithRank']] = {}
+
+    @classmethod
+    def shared(cls, equip: Equipment, rank: EquipmentRank) -> 'EquipWithRank':
+        """
+        Returns the same instance for every use of an equipment with a rank,
+        since the same pair appears in many usages.
+        """
+        key = (equip, rank)
+        if (ewr := cls._shared.get(key)) is None:
+            ewr = cls._shared[key] = cls(equip, rank)
+        return ewr
+
     def __str__(self):
         return f'{self.equip.name} ({self.rank.name.lower()})'
 
 
-EQUIPMENT_SLOT_KEYS = {1, 2, 3, 'aux'}
+EQUIPMENT_SLOT_ORDER: tuple[int | str, ...] = (1, 2, 3, 'aux')
+EQUIPMENT_SLOT_KEYS = set(EQUIPMENT_SLOT_ORDER)
+
+_SLOT_INDEX = {slot: i for i, slot in enumerate(EQUIPMENT_SLOT_ORDER)}
+
+# Default for pop that no caller can pass
+_MISSING = object()
+
+
+class EquipmentSlots(MutableMapping[int | str, list[EquipWithRank]]):
+    """
+    The equipment lists of a usage's slots, stored in a fixed array.
+
+    Behaves like a defaultdict(list) restricted to EQUIPMENT_SLOT_KEYS: looking
+    up a slot creates its list, and only slots that were looked up or set are
+    keys. Using any other key raises KeyError. Slots are always iterated in
+    EQUIPMENT_SLOT_ORDER.
+    """
+    __slots__ = ('_lists',)
+
+    _lists: list[list[EquipWithRank] | None]
+
+    def __init__(self, slots: Mapping[int | str, Iterable[EquipWithRank]] | None = None):
+        self._lists = [None] * len(EQUIPMENT_SLOT_ORDER)
+        for slot, equips in (slots or {}).items():
+            self[slot].extend(equips)
+
+    @staticmethod
+    def _index(slot: int | str) -> int:
+        try:
+            return _SLOT_INDEX[slot]
+        except KeyError:
+            raise KeyError(f'Unknown equipment slot {slot!r}') from None
 
-@dataclass
+    def __getitem__(self, slot: int | str) -> list[EquipWithRank]:
+        i = self._index(slot)
+        if (equips := self._lists[i]) is None:
+            equips = self._lists[i] = []
+        return equips
+
+    def __setitem__(self, slot: int | str, equips: list[EquipWithRank]):
+        self._lists[self._index(slot)] = equips
+
+    def __delitem__(self, slot: int | str):
+        i = self._index(slot)
+        if self._lists[i] is None:
+            raise KeyError(slot)
+        self._lists[i] = None
+
+    # The Mapping and MutableMapping versions of these go through __getitem__,
+    # which would create missing slots
+
+    def get(self, slot, default=None):
+        i = _SLOT_INDEX.get(slot)
+        if i is None or self._lists[i] is None:
+            return default
+        return self._lists[i]
+
+    def setdefault(self, slot, default=None):
+        if (equips := self.get(slot)) is None:
+            equips = self[slot] = default
+        return equips
+
+    def pop(self, slot, default=_MISSING):
+        if (equips := self.get(slot)) is None:
+            if default is _MISSING:
+                raise KeyError(slot)
+            return default
+        del self[slot]
+        return equips
+
+    def __contains__(self, slot) -> bool:
+        return self.get(slot) is not None
+
+    def __iter__(self) -> Iterator[int | str]:
+        return (slot for slot, equips in zip(EQUIPMENT_SLOT_ORDER, self._lists) if equips is not None)
+
+    def __len__(self) -> int:
+        return sum(equips is not None for equips in self._lists)
+
+    def __repr__(self):
+        return f'{type(self).__name__}({dict(self.items())!r})'
+
+
+@dataclass(slots=True)
 class ShipUsage:
     ship: Ship
     description: str | None = None
-    slots: dict[int | str, list[EquipWithRank]] = field(default_factory=lambda: defaultdict(list))
+    slots: EquipmentSlots = field(default_factory=EquipmentSlots)
+    # Description rendered from Markdown for the site
+    description_html: str | None = None
+
+    def __post_init__(self):
+        if not isinstance(self.slots, EquipmentSlots):
+            self.slots = EquipmentSlots(self.slots)
 
     def sort_slots(self):
         for s in self.slots.values():
@@ -247,11 +366,9 @@ class ShipUsage:
         if not self.slots:
             raise ValueError('No equipment slot data')
 
-        missing = EQUIPMENT_SLOT_KEYS.difference(self.slots.keys())
-        extra = set(self.slots.keys()) - EQUIPMENT_SLOT_KEYS
-
-        if missing or extra:
-            raise ValueError(f'{missing} slots missing, extra slots {extra}')
+        # EquipmentSlots rejects other keys, so slots can only be missing
+        if missing := EQUIPMENT_SLOT_KEYS.difference(self.slots.keys()):
+            raise ValueError(f'{missing} slots missing')
 
         if empty_slots := [slot for slot, equip in self.slots.items() if not equip]:
             raise ValueError(f'Emtpy slots {empty_slots}')
@@ -3,12 +3,44 @@ Utility functions and classes that are not specific to this project.
 """
 from collections.abc import Callable
 from collections.abc import Iterable
+from concurrent.futures import Future
+import importlib.util
+import sys
+import threading
+from types import ModuleType
 from typing import Generic
 from typing import TypeVar
 
 K = TypeVar('K')
 V = TypeVar('V')
 
+
+class _LazyModule(ModuleType):
+    def __getattr__(self, attr):
+        # Only called for names the proxy itself does not have. import_module
+        # holds the import system's lock for the module, so threads that get
+        # here at the same time wait for one complete import.
+        return getattr(importlib.import_module(self.__name__), attr)
+
+
+def lazy_import(name: str) -> ModuleType:
+    """
+    Returns a module that is only executed when one of its attributes is first
+    used. Use for dependencies that are slow to import and only needed by some
+    of the code in a module. Safe to first use from several threads at once.
+
+    Names must be accessed through the module (``module.name``), since
+    ``from module import name`` would execute it immediately.
+    """
+    if module := sys.modules.get(name):
+        return module
+
+    if importlib.util.find_spec(name) is None:
+        raise ModuleNotFoundError(f'No module named {name!r}', name=name)
+
+    return _LazyModule(name)
+
+
 class LazyValue(Generic[V]):
     _value: V
 
@@ -62,7 +94,83 @@ class MultikeyCache(Generic[K, V]):
 
         return result, found_cached
 
+    def peek(self, key: K) -> V | None:
+        """Returns the value cached for key without fetching it."""
+        return self._data_cache.get(key, None)
+
     @property
     def allvalues(self):
         # TODO: Decide whether to switch this off set or not
         return set(self._data_cache.values())
+
+
+class ConcurrentMultikeyCache(MultikeyCache[K, V]):
+    """
+    MultikeyCache that can be shared between threads.
+
+    While one thread fetches the value for a key, other threads asking for
+    that key wait for the same result instead of fetching it again.
+    """
+    _lock: threading.Lock
+    _pending: dict[K, Future]
+
+    def __init__(self):
+        super().__init__()
+        self._lock = threading.Lock()
+        self._pending = {}
+
+    def get(
+        self,
+        equivalent_keys: Iterable[K],
+        fetch: Callable[[], V]
+    ) -> tuple[V, bool]:
+        claimed_keys = []
+        claim = Future()
+        found_cached = False
+
+        try:
+            # Keys are iterated outside the lock because generating them may be slow
+            for k in equivalent_keys:
+                with self._lock:
+                    result = self._data_cache.get(k, None)
+                    pending = self._pending.get(k, None)
+                    if not result and not pending:
+                        self._pending[k] = claim
+                        claimed_keys.append(k)
+
+                if result:
+                    found_cached = True
+                    break
+
+                # Waiting while holding claims could deadlock with a thread
+                # waiting on them, so only wait when nothing is claimed yet.
+                if pending and not claimed_keys:
+                    result = pending.result()
+                    found_cached = True
+                    break
+            else:
+                # Only executes when loop did not break
+                result = fetch()
+        except BaseException as ex:
+            with self._lock:
+                for k in claimed_keys:
+                    del self._pending[k]
+            claim.set_exception(ex)
+            raise
+
+        with self._lock:
+            for k in claimed_keys:
+                self._data_cache[k] = result
+                del self._pending[k]
+        claim.set_result(result)
+
+        return result, found_cached
+
+    def peek(self, key: K) -> V | None:
+        with self._lock:
+            return self._data_cache.get(key, None)
+
+    @property
+    def allvalues(self):
+        with self._lock:
+            return set(self._data_cache.values())
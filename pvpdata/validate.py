@@ -0,0 +1,173 @@
+"""
+Checks references between the site's data files and the game resources clone.
+
+All files are loaded once and indexed by name, so every check is a hash lookup
+and the whole validation is a single pass over the data. Problems are
+collected instead of raised so one run reports all of them.
+"""
+
+from collections import defaultdict
+from collections.abc import Iterator
+from collections.abc import Mapping
+from dataclasses import dataclass
+from pathlib import Path
+import sys
+from typing import Any
+
+from . import DATA_DIR
+from . import GAME_RESOURCES_DIR
+from .sitefiles import get_data_path
+from .sitefiles import parse_slot_key
+from .sitefiles import read_pvp_json_data
+from .types import EQUIPMENT_SLOT_KEYS
+from .types import EquipmentRank
+from .types import Equipment
+from .types import Ship
+from .types import ShipUsage
+
+SKIN_IMAGES_DIR = GAME_RESOURCES_DIR / 'images' / 'skins'
+EQUIPMENT_IMAGES_DIR = GAME_RESOURCES_DIR / 'images' / 'equipment'
+
+
+@dataclass(frozen=True)
+class Violation:
+    file: str
+    record: str
+    message: str
+
+    def __str__(self):
+        return f'{self.file}: {self.record}: {self.message}'
+
+
+def _index_directory(directory: Path, *, dirs: bool) -> set[str] | None:
+    """
+    Returns the names of subdirectories, or the stems of files, in directory.
+    Returns None if the directory does not exist.
+    """
+    if not directory.is_dir():
+        return None
+
+    if dirs:
+        return {p.name for p in directory.iterdir() if p.is_dir()}
+    else:
+        return {p.stem for p in directory.iterdir() if p.is_file()}
+
+
+def _check_usage(
+    usage: Mapping[str, Any],
+    ships: Mapping[str, Any],
+    equipment: Mapping[str, Any],
+    file: str,
+) -> Iterator[Violation]:
+    ship_name = usage.get('ship')
+    record = ship_name or '<no ship>'
+
+    if ship_name not in ships:
+        yield Violation(file, record, f'ship not found in {get_data_path(Ship).name}')
+
+    if not usage.get('description'):
+        yield Violation(file, record, 'no description')
+    elif not usage.get('description_html'):
+        yield Violation(file, record, 'description not rendered')
+
+    slots = usage.get('equipment') or {}
+    slot_keys = {parse_slot_key(k) for k in slots}
+    if missing := EQUIPMENT_SLOT_KEYS - slot_keys:
+        yield Violation(file, record, f'missing slots {sorted(map(str, missing))}')
+    if extra := slot_keys - EQUIPMENT_SLOT_KEYS:
+        yield Violation(file, record, f'unknown slots {sorted(map(str, extra))}')
+
+    for slot, equips in slots.items():
+        if not equips:
+            yield Violation(file, record, f'slot {slot} is empty')
+
+        for e in equips:
+            name = e.get('name')
+            if name not in equipment:
+                yield Violation(file, record, f'slot {slot}: {name} not found in {get_data_path(Equipment).name}')
+            if e.get('rank') not in EquipmentRank.__members__:
+                yield Violation(file, record, f'slot {slot}: {name} has unknown rank {e.get("rank")}')
+
+
+def validate_data(
+    data_dir: Path = DATA_DIR,
+    check_assets: bool = True,
+) -> list[Violation]:
+    ship_path = get_data_path(Ship, data_dir)
+    equip_path = get_data_path(Equipment, data_dir)
+    usage_path = get_data_path(ShipUsage, data_dir)
+
+    ships: dict[str, Any] = read_pvp_json_data(ship_path)
+    equipment: dict[str, Any] = read_pvp_json_data(equip_path)
+    usages: list[dict[str, Any]] = read_pvp_json_data(usage_path)
+
+    violations = []
+
+    skin_ids = equip_image_ids = None
+    if check_assets:
+        skin_ids = _index_directory(SKIN_IMAGES_DIR, dirs=True)
+        equip_image_ids = _index_directory(EQUIPMENT_IMAGES_DIR, dirs=False)
+
+        for directory, index in ((SKIN_IMAGES_DIR, skin_ids), (EQUIPMENT_IMAGES_DIR, equip_image_ids)):
+            if index is None:
+                violations.append(Violation(
+                    str(directory.relative_to(GAME_RESOURCES_DIR.parent)),
+                    '<directory>',
+                    'not found. Update gamefiles or skip asset checks.',
+                ))
+
+    # Nicknames are shared between ships and equipment in the guide's links
+    names_by_nickname: dict[str, list[str]] = defaultdict(list)
+
+    for name, ship in ships.items():
+        names_by_nickname[ship.get('nickname')].append(name)
+
+        if ship.get('name') != name:
+            violations.append(Violation(ship_path.name, name, f'key does not match name {ship.get("name")}'))
+
+        if skin_ids is not None and str(ship.get('skin_id')) not in skin_ids:
+            violations.append(Violation(ship_path.name, name, f'no skin images for skin_id {ship.get("skin_id")}'))
+
+    for name, equip in equipment.items():
+        names_by_nickname[equip.get('nickname')].append(name)
+
+        if equip.get('name') != name:
+            violations.append(Violation(equip_path.name, name, f'key does not match name {equip.get("name")}'))
+
+        if equip_image_ids is not None and str(equip.get('image_id')) not in equip_image_ids:
+            violations.append(Violation(equip_path.name, name, f'no image for image_id {equip.get("image_id")}'))
+
+    for nickname, names in names_by_nickname.items():
+        if len(names) > 1:
+            violations.append(Violation(
+                f'{ship_path.name}, {equip_path.name}',
+                nickname,
+                'nickname used by ' + ', '.join(names),
+            ))
+
+    seen_usages = set()
+    for usage in usages:
+        if (ship_name := usage.get('ship')) in seen_usages:
+            violations.append(Violation(usage_path.name, ship_name, 'duplicate usage'))
+        seen_usages.add(ship_name)
+
+        violations.extend(_check_usage(usage, ships, equipment, usage_path.name))
+
+    return violations
+
+
+def main():
+    violations = validate_data(check_assets='--no-assets' not in sys.argv[1:])
+
+    for v in violations:
+        print(v)
+
+    if violations:
+        print(f'{len(violations)} problems found')
+        sys.exit(1)
+
+    print('No problems found')
+
+
+if '__main__' == __name__:
+    main()
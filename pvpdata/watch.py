@@ -0,0 +1,241 @@
+"""
+Watches the exports directory and re-extracts site data when a new or updated
+export of the guide lands.
+
+The wiki client, skin data and page cache stay loaded between runs, and only
+guide tables whose HTML changed since the last run are parsed again. Data files
+are replaced in place, so a running ``jekyll serve`` picks them up.
+"""
+
+from __future__ import annotations
+
+import argparse
+from dataclasses import dataclass
+from hashlib import sha256
+import os
+from pathlib import Path
+import time
+from typing import TYPE_CHECKING
+
+from .external import ExternalData
+from .external import SharedWikiClient
+from .external import get_shared_wiki_client
+from .external import load_skin_data
+from .extract import EXPORTS_DIR
+from .extract import EXPORT_GLOB
+from .extract import GUIDE_TABLE_NAMES
+from .extract import find_guide_tables
+from .extract import find_latest_export
+from .extract import load_export
+from .extract import parse_equip_table
+from .extract import report_problems
+from .extract import write_site_data
+from .gamefiles import GameDataResolver
+from .types import ShipUsage
+from .util import MultikeyCache
+
+if TYPE_CHECKING:
+    from mediawiki import MediaWiki
+
+
+class _RecordingCache:
+    """
+    Passes lookups through to a shared cache and records the values returned,
+    so each table knows which ships and equipment it refers to.
+    """
+
+    def __init__(self, cache: MultikeyCache[str, ExternalData]):
+        self._cache = cache
+        self.values: set[ExternalData] = set()
+
+    def get(self, equivalent_keys, fetch):
+        result, cached = self._cache.get(equivalent_keys, fetch)
+        self.values.add(result)
+        return result, cached
+
+
+@dataclass(frozen=True)
+class _TableResult:
+    digest: str
+    usages: list[ShipUsage]
+    failures: list
+    values: set[ExternalData]
+
+
+class IncrementalExtractor:
+    _tables: dict[str, _TableResult]
+
+    def __init__(
+        self,
+        client: MediaWiki | SharedWikiClient | None = None,
+        cache: MultikeyCache[str, ExternalData] | None = None,
+        resolver: GameDataResolver | None = None,
+    ):
+        self.client = client or get_shared_wiki_client()
+        self.ship_skin_data = resolver.skin_data if resolver else load_skin_data()
+        self.cache = cache or MultikeyCache()
+        self.resolver = resolver
+        self._tables = {}
+
+    @property
+    def _results(self) -> list[_TableResult]:
+        return [self._tables[t] for t in GUIDE_TABLE_NAMES if t in self._tables]
+
+    @property
+    def usages(self) -> list[ShipUsage]:
+        """Usages from the tables of the last extracted export."""
+        return [u for r in self._results for u in r.usages]
+
+    @property
+    def failures(self) -> list:
+        return [f for r in self._results for f in r.failures]
+
+    @property
+    def values(self) -> set[ExternalData]:
+        """Ships and equipment the tables of the last extracted export refer to."""
+        return set().union(*(r.values for r in self._results))
+
+    def extract(self, export_path: Path) -> bool:
+        """
+        Re-parses the tables in export_path that changed since the last run and
+        rewrites the data files. Returns whether any table changed.
+        """
+        print('Extracting', export_path.name)
+        tables = find_guide_tables(load_export(export_path))
+
+        changed = False
+        for table_name, table_element in tables.items():
+            digest = sha256(str(table_element).encode('utf-8')).hexdigest()
+
+            previous = self._tables.get(table_name)
+            if previous and previous.digest == digest:
+                print(table_name, 'unchanged')
+                continue
+
+            recorder = _RecordingCache(self.cache)
+            usages, failures = parse_equip_table(
+                self.client,
+                self.ship_skin_data,
+                recorder,
+                table_element,
+                interactive=False,
+                resolver=self.resolver,
+            )
+            self._tables[table_name] = _TableResult(
+                digest,
+                usages,
+                [(table_name, *f) for f in failures],
+                recorder.values,
+            )
+            changed = True
+
+        if not changed:
+            print('No table changes in', export_path.name)
+            return False
+
+        report_problems(self.values, self.failures)
+        print()
+        write_site_data(self.values, self.usages)
+
+        return True
+
+
+class ExportWatcher:
+    """
+    Polls a directory for export files and reports files once they have not
+    changed for the debounce period, so half-written exports are skipped.
+    """
+
+    # (modification time, size) as of the last poll
+    _signatures: dict[Path, tuple[int, int]]
+    # When each signature was first seen
+    _changed_at: dict[Path, float]
+    _reported: dict[Path, tuple[int, int]]
+
+    def __init__(self, exports_dir: Path, debounce: float):
+        self.exports_dir = exports_dir
+        self.debounce = debounce
+        self._signatures = {}
+        self._changed_at = {}
+        self._reported = {}
+
+    def start(self):
+        """Records the files already present so only later changes are reported."""
+        self.poll()
+        self._reported = dict(self._signatures)
+
+    def poll(self) -> list[Path]:
+        now = time.monotonic()
+        current = {}
+
+        with os.scandir(self.exports_dir) as entries:
+            for entry in entries:
+                path = Path(entry.path)
+                if not entry.is_file() or not path.match(EXPORT_GLOB):
+                    continue
+
+                stat = entry.stat()
+                current[path] = signature = (stat.st_mtime_ns, stat.st_size)
+                if self._signatures.get(path) != signature:
+                    self._changed_at[path] = now
+
+        self._signatures = current
+        self._changed_at = {p: t for p, t in self._changed_at.items() if p in current}
+
+        settled = []
+        for path, signature in current.items():
+            if self._reported.get(path) != signature and now - self._changed_at[path] >= self.debounce:
+                self._reported[path] = signature
+                settled.append(path)
+
+        # Export names end with the guide date, so sorting puts the newest last
+        return sorted(settled)
+
+
+def watch(exports_dir: Path = EXPORTS_DIR, interval: float = 1, debounce: float = 2):
+    extractor = IncrementalExtractor()
+    watcher = ExportWatcher(exports_dir, debounce)
+
+    watcher.start()
+    extractor.extract(find_latest_export(exports_dir))
+
+    print()
+    print(f'Watching {exports_dir} for {EXPORT_GLOB} (Ctrl+C to stop)')
+
+    try:
+        while True:
+            time.sleep(interval)
+
+            settled = watcher.poll()
+            if not settled:
+                continue
+
+            # Older guides, like ones added for the usage history, must not
+            # replace the data from the newest guide
+            latest = find_latest_export(exports_dir)
+            if latest not in settled:
+                print('Skipping older exports:', ', '.join(p.name for p in settled))
+                continue
+
+            try:
+                extractor.extract(latest)
+            except Exception as ex:
+                print('Error extracting', latest.name, ex)
+
+            print()
+            print('Watching for changes')
+    except KeyboardInterrupt:
+        print('Stopped watching')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--interval', type=float, default=1, help='Seconds between checks for changes')
+    parser.add_argument('--debounce', type=float, default=2, help='Seconds a file must stay unchanged before extracting')
+    args = parser.parse_args()
+
+    watch(interval=args.interval, debounce=args.debounce)
+
+
+if '__main__' == __name__:
+    main()
@@ -1,3 +1,4 @@
+from datetime import date
 from functools import partial
 import json
 from pathlib import Path
@@ -5,21 +6,26 @@ import shutil
 
 from invoke import task
 from invoke.exceptions import Exit
-# We only use GitPython for some specific utilities.
-# It does not support sparse checkouts and other features we
-# use to minimize disk space and downloads.
-from git.util import rmtree as git_rmtree
-from git.repo.fun import is_git_dir
 
-import pvpdata
 from pvpdata import GAME_RESOURCES_DIR
 from pvpdata import PROJECT_ROOT
 from pvpdata import SITE_SOURCE
+from pvpdata.datadiff import add_changelog_entry
+from pvpdata.datadiff import diff_site_data
+from pvpdata.datadiff import read_raw_site_data
+from pvpdata.datadiff import read_raw_site_data_at_revision
+from pvpdata.datadiff import render_changelog_entry
+from pvpdata.sitefiles import get_data_path
+from pvpdata.sitefiles import load_site_data
+from pvpdata.sitefiles import write_pvp_json_data
+from pvpdata.types import Equipment
 from pvpdata.types import Ship
+from pvpdata.types import ShipUsage
+from pvpdata.validate import validate_data
 
 
 RESOURCE_REPO_URL = r'https://github.com/Fernando2603/AzurLane.git'
-PVP_SHIP_FILE = pvpdata.get_data_path(Ship)
+PVP_SHIP_FILE = get_data_path(Ship)
 
 
 def exec_gamefiles_git(ctx, command):
@@ -35,6 +41,12 @@ def cleangamefiles(ctx):
             # that prevent normal deletion from working.
             print(f'Deleting {GAME_RESOURCES_DIR.name}', end=' ')
             if not ctx.config.run.dry:
+                # We only use GitPython for some specific utilities.
+                # It does not support sparse checkouts and other features we
+                # use to minimize disk space and downloads.
+                # GitPython is slow to import, so only import it when it is used.
+                from git.util import rmtree as git_rmtree
+
                 print('...', end=' ')
                 git_rmtree(GAME_RESOURCES_DIR)
                 print('Complete')
@@ -46,6 +58,9 @@ def cleangamefiles(ctx):
 
 @task
 def initgamefiles(ctx):
+    # See cleangamefiles about GitPython
+    from git.repo.fun import is_git_dir
+
     print(f'Ensuring {GAME_RESOURCES_DIR.name} clone is initialized')
     if not GAME_RESOURCES_DIR.exists():
         print(f'Creating {GAME_RESOURCES_DIR.name}')
@@ -120,3 +135,132 @@ def updategamefiles(ctx):
 @task(cleangamefiles, updategamefiles)
 def recreategamefiles(ctx):
     pass
+
+
+@task
+def analyzeloadouts(ctx, top=5):
+    """
+    Writes similar ships and equipment recommendations for each ship to the site data.
+    """
+    # NumPy is slow to import, so only import it for this task
+    from pvpdata.loadouts import write_loadout_analysis
+
+    write_loadout_analysis(load_site_data().usages, int(top))
+
+
+@task
+def validate(ctx, assets=True):
+    """
+    Checks references between data files and, unless --no-assets, the gamefiles images.
+    """
+    violations = validate_data(check_assets=assets)
+
+    for v in violations:
+        print(v)
+
+    if violations:
+        raise Exit(f'{len(violations)} problems found')
+
+    print('No problems found')
+
+
+@task
+def datadiff(ctx, old='HEAD', delta=None, changelog=False):
+    """
+    Summarizes data file changes since a git revision as a changelog entry.
+    """
+    changes = diff_site_data(read_raw_site_data_at_revision(old), read_raw_site_data())
+
+    if not changes:
+        print(f'No data changes since {old}')
+        return
+
+    entry = render_changelog_entry(changes, date.today())
+    print(entry)
+
+    if delta:
+        write_pvp_json_data(Path(delta), changes.to_json_data())
+
+    if changelog:
+        add_changelog_entry(entry, date.today())
+
+
+@task
+def benchstartup(ctx):
+    """
+    Fails if task listing or lightweight commands exceed their import time budget.
+    """
+    from pvpdata.benchmarks import check_startup_budgets
+
+    if problems := check_startup_budgets():
+        raise Exit('\n'.join(problems))
+
+
+@task
+def benchmemory(ctx, count=10_000):
+    """
+    Prints memory used per ship when holding many usages in memory.
+    """
+    from pvpdata.benchmarks import measure_usage_memory
+
+    measure_usage_memory(int(count))
+
+
+@task
+def crosscheck(ctx):
+    """
+    Compares ship and equipment data from the wiki with the gamefiles data.
+    """
+    from pvpdata.gamefiles import GameDataResolver
+    from pvpdata.gamefiles import cross_check
+
+    site_data = load_site_data()
+    problems = cross_check(
+        GameDataResolver.load(),
+        [*site_data.ships.values(), *site_data.equipment.values()],
+    )
+
+    for p in problems:
+        print(p)
+
+    if problems:
+        raise Exit(f'{len(problems)} differences found')
+
+    print('Wiki and gamefiles data agree')
+
+
+@task
+def benchencoding(ctx, count=10_000):
+    """
+    Compares data file encoding time with dataclasses.asdict conversion and
+    prints the size of each data file format.
+    """
+    from pvpdata.benchmarks import measure_encoding
+
+    measure_encoding(int(count))
+
+
+@task
+def deploydata(ctx):
+    """
+    Writes minified and precompressed copies of the data files for deployment.
+    """
+    from pvpdata.sitefiles import DEPLOY_DATA_DIR
+    from pvpdata.sitefiles import write_deploy_json_data
+
+    site_data = load_site_data()
+    write_deploy_json_data(get_data_path(Ship, DEPLOY_DATA_DIR), site_data.ships)
+    write_deploy_json_data(get_data_path(Equipment, DEPLOY_DATA_DIR), site_data.equipment)
+    write_deploy_json_data(get_data_path(ShipUsage, DEPLOY_DATA_DIR), site_data.usages)
+
+
+@task
+def renderdescriptions(ctx):
+    """
+    Renders ship usage descriptions to HTML in the usage data file.
+    """
+    from pvpdata.descriptions import render_descriptions
+
+    usages = load_site_data().usages
+    render_descriptions(usages)
+    write_pvp_json_data(get_data_path(ShipUsage), usages)